@@ -0,0 +1,9 @@
+"""`python -m wraith <command>` from the repository root; see cli.py."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from cli import main  # noqa: E402
+
+sys.exit(main())
@@ -913,6 +913,36 @@ function smoothProb(side, p){
   return avg;
 }
 
+// ===================== CNN cascade (optional) =====================
+// model/cascade.json (written by cascade.py) holds EAR / mouth-ratio bands outside of which
+// geometry alone is decisive; there we skip the CNN and feed a 0/1 stand-in probability into
+// the usual smoothing, exactly like infer_offline.py does.
+let cascadeCfg = null;
+async function loadCascadeConfig(){
+  try{
+    const res = await fetch('model/cascade.json');
+    if(res.ok) cascadeCfg = await res.json();
+    if(cascadeCfg) console.log('CNN cascade bands loaded', cascadeCfg.eye, cascadeCfg.mouth);
+  }catch(_){ cascadeCfg = null; }
+}
+loadCascadeConfig();
+
+function cascadeEyeProbs(earAvg){
+  const c = cascadeCfg?.eye;
+  if(!c) return null;
+  if(c.ear_closed_below != null && earAvg < c.ear_closed_below) return [1, 1];
+  if(c.ear_open_above != null && earAvg > c.ear_open_above) return [0, 0];
+  return null;
+}
+
+function cascadeYawnProb(mor){
+  const c = cascadeCfg?.mouth;
+  if(!c) return null;
+  if(c.mor_no_yawn_below != null && mor < c.mor_no_yawn_below) return 0;
+  if(c.mor_yawn_above != null && mor > c.mor_yawn_above) return 1;
+  return null;
+}
+
 // Eye Aspect Ratio like metric using MediaPipe FaceMesh indices
 // We'll use eye landmark sets approximated from MediaPipe indexes
 const LEFT_EYE = { // key pairs approximating vertical distances and horizontal width
@@ -1252,16 +1282,20 @@ function onResults(results){
       // If CNN is enabled and model is loaded, compute per-eye closed probabilities.
       if(useCnn && haveModel){
         try{
-          // Compute eye boxes and crop from the source image (results.image is same as video frame drawn)
-          const boxL = landmarksEyeBox(lm, LEFT_EYE);
-          const boxR = landmarksEyeBox(lm, RIGHT_EYE);
-          const tL = cropEyeToTensor(els.canvas, boxL);
-          const tRraw = cropEyeToTensor(els.canvas, boxR);
-          const tR = flipTensorLeftRight(tRraw); // flip right eye for consistency
-          const batch = tf.stack([tL, tR], 0); // [2, H, W, 1]
-          const preds = eyeModel.predict(batch);
-          const probs = Array.from(preds.dataSync()); // assuming shape [2,1] or [2]
-          tf.dispose([tL, tRraw, tR, batch, preds]);
+          // Cascade: skip the CNN when EAR alone is decisive
+          let probs = cascadeEyeProbs(earAvg);
+          if(!probs){
+            // Compute eye boxes and crop from the source image (results.image is same as video frame drawn)
+            const boxL = landmarksEyeBox(lm, LEFT_EYE);
+            const boxR = landmarksEyeBox(lm, RIGHT_EYE);
+            const tL = cropEyeToTensor(els.canvas, boxL);
+            const tRraw = cropEyeToTensor(els.canvas, boxR);
+            const tR = flipTensorLeftRight(tRraw); // flip right eye for consistency
+            const batch = tf.stack([tL, tR], 0); // [2, H, W, 1]
+            const preds = eyeModel.predict(batch);
+            probs = Array.from(preds.dataSync()); // assuming shape [2,1] or [2]
+            tf.dispose([tL, tRraw, tR, batch, preds]);
+          }
           const pL = smoothProb('L', probs[0]);
           const pR = smoothProb('R', probs[1] ?? probs[0]);
 
@@ -1301,15 +1335,18 @@ function onResults(results){
     if(els.useCnn?.checked && eyeModel){
       // Recompute quick CNN probs for the target only to decide accumulation (ensure values exist even if above loop didn't run or target changed)
       try{
-        const boxL = landmarksEyeBox(lm, LEFT_EYE);
-        const boxR = landmarksEyeBox(lm, RIGHT_EYE);
-  const tL = cropEyeToTensor(els.canvas, boxL);
-  const tRraw = cropEyeToTensor(els.canvas, boxR);
-        const tR = flipTensorLeftRight(tRraw);
-        const batch = tf.stack([tL, tR], 0);
-        const preds = eyeModel.predict(batch);
-        const probs = Array.from(preds.dataSync());
-        tf.dispose([tL, tRraw, tR, batch, preds]);
+        let probs = cascadeEyeProbs(ear);
+        if(!probs){
+          const boxL = landmarksEyeBox(lm, LEFT_EYE);
+          const boxR = landmarksEyeBox(lm, RIGHT_EYE);
+          const tL = cropEyeToTensor(els.canvas, boxL);
+          const tRraw = cropEyeToTensor(els.canvas, boxR);
+          const tR = flipTensorLeftRight(tRraw);
+          const batch = tf.stack([tL, tR], 0);
+          const preds = eyeModel.predict(batch);
+          probs = Array.from(preds.dataSync());
+          tf.dispose([tL, tRraw, tR, batch, preds]);
+        }
         const pL = smoothProb('L', probs[0]);
         const pR = smoothProb('R', probs[1] ?? probs[0]);
         if(els.cnnL) els.cnnL.textContent = pL.toFixed(2);
@@ -1626,11 +1663,18 @@ document.addEventListener('DOMContentLoaded', ()=>{
         const cx = (left.x + right.x)/2; const cy = (top.y + bottom.y)/2;
         const w = Math.abs(right.x - left.x) * 1.6; const h = Math.abs(bottom.y - top.y) * 2.2;
         const box = { cx, cy, w, h };
-        const t = cropMouthFromCanvas(box, els.canvas);
-        const batch = tf.tidy(()=>tf.expandDims(t, 0));
-        const preds = mouthModel.predict(batch);
-        const probs = Array.from(preds.dataSync());
-        tf.dispose([t, batch, preds]);
+        let probs;
+        const gatedYawn = cascadeYawnProb(mouthOpenRatio(lm));
+        if(gatedYawn != null){
+          // Cascade: mouth ratio is decisive; one-hot stand-in (neutral/yawn) for the multi-class model
+          probs = (mouthModel._yawnBinary) ? [gatedYawn] : (gatedYawn ? [0,0,0,1] : [1,0,0,0]);
+        } else {
+          const t = cropMouthFromCanvas(box, els.canvas);
+          const batch = tf.tidy(()=>tf.expandDims(t, 0));
+          const preds = mouthModel.predict(batch);
+          probs = Array.from(preds.dataSync());
+          tf.dispose([t, batch, preds]);
+        }
 
         // Binary yawn model handling (preferred)
         if(mouthModel._yawnBinary || probs.length <= 2){
@@ -0,0 +1,187 @@
+"""
+Geometry-gated cascade: run the eye/mouth CNNs only when landmarks are ambiguous.
+
+When the EAR is far from the threshold the eye state is obvious from
+geometry alone, and a yawn is impossible while the mouth-opening ratio (MOR)
+is small. The cascade config holds confidence bands learned from validation
+traces; outside a band the geometric decision is used and the CNN is skipped.
+infer_offline.py and app.js both read the same JSON.
+
+Usage:
+  # 1) record validation traces with the cascade off (CNN on every frame)
+  python infer_offline.py --video session.mp4 --out traces/session.csv
+  # 2) learn the bands, report skip rate/accuracy, write the browser config
+  python cascade.py traces/*.csv --out model/cascade.json --agreement 0.995
+
+Config (model/cascade.json):
+  {"eye":   {"ear_closed_below": 0.17, "ear_open_above": 0.29, "cnn_thresh": 0.6},
+   "mouth": {"mor_no_yawn_below": 0.31, "mor_yawn_above": null}}
+A null bound disables that side of the band.
+
+The reference decision for calibration is the `label`/`yawn_label` column
+when present, otherwise the full CNN decision (p >= threshold, as in app.js).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from simulate_alarm import load_trace
+
+
+def load_cascade(path):
+    """Load a cascade config, or None when the file does not exist."""
+    if not path:
+        return None
+    p = Path(path)
+    if not p.exists():
+        return None
+    return json.loads(p.read_text())
+
+
+def eye_gate(ear: float, cfg):
+    """Return a stand-in closed probability (1.0/0.0) when EAR is decisive, else None."""
+    c = (cfg or {}).get('eye')
+    if not c:
+        return None
+    lo, hi = c.get('ear_closed_below'), c.get('ear_open_above')
+    if lo is not None and ear < lo:
+        return 1.0
+    if hi is not None and ear > hi:
+        return 0.0
+    return None
+
+
+def mouth_gate(mor: float, cfg):
+    """Return a stand-in yawn probability (0.0/1.0) when MOR is decisive, else None."""
+    c = (cfg or {}).get('mouth')
+    if not c:
+        return None
+    lo, hi = c.get('mor_no_yawn_below'), c.get('mor_yawn_above')
+    if lo is not None and mor < lo:
+        return 0.0
+    if hi is not None and mor > hi:
+        return 1.0
+    return None
+
+
+def fit_band(x, agree_low, agree_high, agreement: float, min_support: int):
+    """Widest decisive tails of `x` that agree with the reference.
+
+    agree_low[i] / agree_high[i]: whether the low-side / high-side geometric
+    decision matches the reference for sample i. Returns (lo, hi) such that
+    samples with x < lo agree at >= `agreement` (same for x > hi); either
+    bound is None when no tail with `min_support` samples qualifies.
+    """
+    order = np.argsort(x, kind='stable')
+    xs = np.asarray(x)[order]
+    n = len(xs)
+    lo = hi = None
+
+    # candidate cut after k samples is only valid where the value changes (ties stay together)
+    k = np.arange(1, n + 1)
+    prec_low = np.cumsum(np.asarray(agree_low)[order]) / k
+    cut_ok = np.append(xs[1:] > xs[:-1], True)
+    ok = (prec_low >= agreement) & (k >= min_support) & cut_ok
+    if ok.any():
+        kk = np.flatnonzero(ok)[-1]
+        lo = float(xs[kk + 1]) if kk + 1 < n else float(xs[kk]) + 1e-9
+
+    prec_high = np.cumsum(np.asarray(agree_high)[order][::-1]) / k
+    xs_rev = xs[::-1]
+    cut_ok = np.append(xs_rev[1:] < xs_rev[:-1], True)
+    ok = (prec_high >= agreement) & (k >= min_support) & cut_ok
+    if ok.any():
+        kk = np.flatnonzero(ok)[-1]
+        hi = float(xs_rev[kk + 1]) if kk + 1 < n else float(xs_rev[kk]) - 1e-9
+
+    if lo is not None and hi is not None and lo > hi:
+        # tails overlap: geometry alone separates the classes, split at the midpoint
+        lo = hi = (lo + hi) / 2.0
+    return lo, hi
+
+
+def _report(name, x, p_full, label, lo, hi, low_value):
+    """Skip rate and accuracy of the cascaded decision vs the full CNN."""
+    low = x < lo if lo is not None else np.zeros(len(x), dtype=bool)
+    high = x > hi if hi is not None else np.zeros(len(x), dtype=bool)
+    cascaded = np.where(low, low_value, np.where(high, not low_value, p_full))
+    skip = float((low | high).mean())
+    line = f"{name}: skip {skip:.1%} of CNN calls, agreement with full CNN {float((cascaded == p_full).mean()):.2%}"
+    if label is not None:
+        line += f", accuracy {float((p_full == label).mean()):.2%} -> {float((cascaded == label).mean()):.2%}"
+    print(line)
+    return {'skip_rate': skip, 'agreement_with_cnn': float((cascaded == p_full).mean())}
+
+
+def calibrate(traces, agreement: float, min_support: int, cnn_thresh: float, yawn_thresh: float, mor_min: float):
+    def cat(key):
+        return np.concatenate([t[key] for t in traces])
+
+    cfg = {'calibration': {'frames': int(sum(len(t['t']) for t in traces)), 'agreement': agreement}}
+
+    def finite(x_key, p_key, label_key):
+        """Frames with both a geometry value and a CNN output (no-face rows and
+        traces recorded without the model have blanks, loaded as NaN)."""
+        if not all(t[x_key] is not None and t[p_key] is not None for t in traces):
+            return None
+        x, p = cat(x_key), cat(p_key)
+        ok = np.isfinite(x) & np.isfinite(p)
+        if not ok.any():
+            return None
+        label = cat(label_key)[ok] if all(t[label_key] is not None for t in traces) else None
+        return x[ok], p[ok], label
+
+    eye = finite('ear', 'p_closed', 'label')
+    if eye is not None:
+        ear, p_closed, label = eye
+        cnn_closed = p_closed >= cnn_thresh
+        ref = label if label is not None else cnn_closed
+        lo, hi = fit_band(ear, ref, ~ref, agreement, min_support)
+        cfg['eye'] = {'ear_closed_below': lo, 'ear_open_above': hi, 'cnn_thresh': cnn_thresh}
+        cfg['calibration']['eye'] = _report('eye', ear, cnn_closed, label, lo, hi, True)
+
+    mouth = finite('mor', 'p_yawn', 'yawn_label')
+    if mouth is not None:
+        mor, p_yawn, label = mouth
+        # app.js only reports a yawn when both the smoothed p and the MOR gate pass
+        cnn_yawn = (p_yawn >= yawn_thresh) & (mor >= mor_min)
+        ref = label if label is not None else cnn_yawn
+        lo, hi = fit_band(mor, ~ref, ref, agreement, min_support)
+        cfg['mouth'] = {'mor_no_yawn_below': lo, 'mor_yawn_above': hi}
+        cfg['calibration']['mouth'] = _report('mouth', mor, cnn_yawn, label, lo, hi, False)
+    return cfg
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('traces', nargs='+', help='Trace CSVs recorded with the cascade off')
+    p.add_argument('--out', type=str, default='model/cascade.json')
+    p.add_argument('--agreement', type=float, default=0.995, help='Required agreement inside each skip band')
+    p.add_argument('--min_support', type=int, default=50, help='Minimum frames in a skip band')
+    p.add_argument('--cnn_thresh', type=float, default=0.6, help='CNN Closed Prob (app default 0.60)')
+    p.add_argument('--yawn_thresh', type=float, default=0.6, help='Yawn Probability (app default 0.60)')
+    p.add_argument('--mor_min', type=float, default=0.35, help='Min Mouth Opening (app default 0.35)')
+    args = p.parse_args()
+
+    traces = [tr for tr in (load_trace(Path(f)) for f in args.traces) if tr is not None]
+    if not traces:
+        print('No frames in', args.traces)
+        sys.exit(1)
+    if any(tr.get('eye_cnn') is not None and not tr['eye_cnn'][tr['face']].all() for tr in traces):
+        print('Warning: some traces were recorded with the cascade on; bands will be biased toward the old config.')
+    cfg = calibrate(traces, args.agreement, args.min_support, args.cnn_thresh, args.yawn_thresh, args.mor_min)
+    if 'eye' not in cfg and 'mouth' not in cfg:
+        print('Traces need ear+p_closed and/or mor+p_yawn columns with CNN outputs')
+        sys.exit(1)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(cfg, indent=2))
+    print('Cascade config written to', out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+`wraith` — one entry point for the data, training and export tools.
+
+Usage:
+  python cli.py <command> [args...]        (from wraith/)
+  python -m wraith <command> [args...]     (from the repo root)
+  python cli.py <command> --help
+
+Each command runs the matching script's main() with the remaining arguments.
+Only the chosen script is imported, and the scripts import TensorFlow,
+MediaPipe and OpenCV lazily (lazy_imports.py), so `--help`, `patch` and the
+NumPy-only tools start in well under a second. scripts/bench_startup.py
+measures this.
+"""
+import importlib
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+# command -> (module, directory relative to wraith/, one-line description)
+COMMANDS = {
+    'collect-eye': ('collect_eye_data', '.', 'Capture open/closed eye crops from the webcam'),
+    'collect-mouth': ('collect_yawn_data', '.', 'Capture neutral/open/smile/yawn mouth crops from the webcam'),
+    'train-eye': ('train_eye_cnn', '.', 'Train the eye-state CNN and export TF.js'),
+    'train-mouth': ('train_mouth_classifier', '.', 'Train the mouth classifier and export TF.js'),
+    'export': ('export_models', '.', 'Convert a saved .keras model to TF.js'),
+    'patch': ('patch_tfjs_model_json', 'scripts', 'Normalize InputLayer keys in TF.js model.json files'),
+    'bench-tflite': ('tflite_backend', '.', 'Benchmark TFLite (XNNPACK) exports against Keras predict'),
+    'infer': ('infer_offline', '.', 'Per-frame EAR/MOR/CNN trace for a recorded video'),
+    'stats': ('dataset_stats', '.', 'Incremental per-class/session/eye counts, histograms and duplicates'),
+    'select': ('select_uncertain_crops', '.', 'Active learning: queue the most uncertain unlabeled crops'),
+    'simulate': ('simulate_alarm', '.', 'Sweep alarm thresholds/smoothing over recorded traces'),
+    'calibrate': ('cascade', '.', 'Learn EAR/MOR cascade bands and write model/cascade.json'),
+}
+
+
+def usage() -> str:
+    width = max(len(c) for c in COMMANDS)
+    lines = ['usage: wraith <command> [args...]', '', 'commands:']
+    lines += [f"  {c:<{width}}  {desc}" for c, (_, _, desc) in COMMANDS.items()]
+    lines += ['', "Run 'wraith <command> --help' for command options."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    cmd, rest = argv[0], argv[1:]
+    if cmd not in COMMANDS:
+        print(f"wraith: unknown command '{cmd}'\n\n{usage()}", file=sys.stderr)
+        return 2
+    module, subdir, _ = COMMANDS[cmd]
+    for d in (HERE, HERE / subdir):
+        if str(d) not in sys.path:
+            sys.path.insert(0, str(d))
+    # scripts parse sys.argv themselves; show the subcommand in their usage line
+    sys.argv = [f"wraith {cmd}", *rest]
+    importlib.import_module(module).main()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,15 +19,14 @@ import argparse
 import time
 from pathlib import Path
 
-try:
-    import cv2  # type: ignore[reportMissingImports]
-except Exception as e:
-    raise SystemExit("OpenCV (cv2) is required. Install deps: python3 -m pip install -r requirements.txt\n" + str(e))
 import numpy as np
-try:
-    import mediapipe as mp  # type: ignore[reportMissingImports]
-except Exception as e:
-    raise SystemExit("MediaPipe is required. Install deps: python3 -m pip install -r requirements.txt\n" + str(e))
+
+from dataset_stats import class_counts
+from lazy_imports import lazy_import
+
+# imported on first use; a missing package exits with the install hint
+cv2 = lazy_import('cv2', hint="OpenCV (cv2) is required. Install deps: python3 -m pip install -r requirements.txt")
+mp = lazy_import('mediapipe', hint="MediaPipe is required. Install deps: python3 -m pip install -r requirements.txt")
 
 
 LEFT_EYE = {
@@ -109,7 +108,9 @@ def main():
         print("Use --samples N to save N images per keypress (burst).")
         headless = bool(args.no_preview)
         active_label = 'open'
-        counts = {'open': len(list(out_open.glob('*.png'))), 'closed': len(list(out_closed.glob('*.png')))}
+        # cached per-directory listing (dataset_stats.py); only new files are stat'ed
+        known = class_counts(out_root)
+        counts = {'open': known.get('open', 0), 'closed': known.get('closed', 0)}
 
         while True:
             ok, frame = cap.read()
@@ -21,9 +21,12 @@ import argparse
 import time
 from pathlib import Path
 
-import cv2
 import numpy as np
-import mediapipe as mp
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+mp = lazy_import('mediapipe')
 
 # Use a few mouth landmarks to compute a mouth box
 MOUTH_LANDMARKS = [13, 14, 61, 291, 78, 308]
@@ -0,0 +1,287 @@
+"""
+Incremental dataset statistics for the collected eye/mouth crops.
+
+Usage:
+  python dataset_stats.py data/eye
+  python dataset_stats.py data/eye data/mouth --json stats.json
+  python dataset_stats.py data/eye --counts_only      # no decoding, just counts
+  python dataset_stats.py data/eye --full             # re-stat every file
+
+Reports per-class counts, per-session and per-eye (L/R) breakdowns from
+metadata.csv, brightness (mean) and contrast (std) histograms and the
+duplicate ratio (identical file contents), including duplicates that sit in
+two different classes.
+
+The summary persists in <root>/.wraith_stats.json, one entry per file keyed
+by size/mtime with its content hash and brightness/contrast. A class
+directory whose mtime has not changed is not listed again, only new files
+are read and decoded, and metadata.csv is read from the byte offset where the
+last run stopped. --full re-stats every file to catch in-place edits.
+
+The trainers use class_counts() for --class_weights auto, and
+collect_eye_data.py for its on-screen counts.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2', hint="OpenCV (cv2) is required. Install deps: python3 -m pip install -r requirements.txt")
+
+CACHE_NAME = '.wraith_stats.json'
+CACHE_VERSION = 2
+# formats image_dataset_from_directory accepts; the trainers and select_uncertain_crops.py list the same files
+IMAGE_EXTS = ('.bmp', '.gif', '.jpeg', '.jpg', '.png')
+BRIGHTNESS_BINS = np.linspace(0, 256, 9)
+CONTRAST_BINS = np.linspace(0, 128, 9)
+# a file entry is [size, mtime_ns, hash, mean, std]; hash None = not analyzed yet
+SIZE, MTIME, HASH, MEAN, STD = range(5)
+
+
+def load_cache(root: Path):
+    path = Path(root) / CACHE_NAME
+    try:
+        cache = json.loads(path.read_text(encoding='utf-8'))
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'dirs': {}, 'meta': {}}
+
+
+def save_cache(root: Path, cache):
+    # unique temp file: concurrent runs on one root each replace the cache atomically
+    with tempfile.NamedTemporaryFile('w', dir=root, prefix=CACHE_NAME, suffix='.tmp', encoding='utf-8',
+                                     delete=False) as f:
+        json.dump(cache, f, separators=(',', ':'))
+    try:
+        os.replace(f.name, Path(root) / CACHE_NAME)
+    except OSError:
+        os.unlink(f.name)
+        raise
+
+
+def analyze_file(path: str, st):
+    data = Path(path).read_bytes()
+    digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return [st.st_size, st.st_mtime_ns, digest, None, None]
+    return [st.st_size, st.st_mtime_ns, digest, round(float(img.mean()), 2), round(float(img.std()), 2)]
+
+
+def scan_dir(d: Path, entry, analyze: bool = True, full: bool = False):
+    """Bring one class directory's cache entry up to date; returns files (re)read."""
+    files = entry.setdefault('files', {})
+    mtime = d.stat().st_mtime_ns  # taken before listing, so a concurrent write forces a rescan
+    pending = analyze and any(v[HASH] is None for v in files.values())
+    if not full and not pending and entry.get('mtime_ns') == mtime:
+        return 0
+    names, changed = set(), 0
+    with os.scandir(d) as it:
+        for e in it:
+            if not e.name.lower().endswith(IMAGE_EXTS) or not e.is_file():
+                continue
+            names.add(e.name)
+            old = files.get(e.name)
+            if old is not None and (old[HASH] is not None or not analyze):
+                if not full:
+                    continue
+                st = e.stat()
+                if (old[SIZE], old[MTIME]) == (st.st_size, st.st_mtime_ns):
+                    continue
+            else:
+                st = e.stat()
+            files[e.name] = analyze_file(e.path, st) if analyze else [st.st_size, st.st_mtime_ns, None, None, None]
+            changed += 1
+    for gone in set(files) - names:
+        del files[gone]
+    entry['mtime_ns'] = mtime
+    return changed
+
+
+def session_of(row, state, gap_ms):
+    """Session id for a metadata row: its `session` column, else a new session
+    whenever the timestamp jumps by more than the gap."""
+    if row.get('session'):
+        return row['session']
+    try:
+        ts = int(row.get('timestamp') or 0)
+    except ValueError:
+        return state.get('session') or 'unknown'
+    if state.get('session') is None or ts - (state.get('last_ts') or 0) > gap_ms:
+        state['session'] = time.strftime('%Y-%m-%d %H:%M', time.localtime(ts / 1000))
+    state['last_ts'] = ts
+    return state['session']
+
+
+def update_meta(path: Path, state, gap_s: float):
+    """Fold new metadata.csv rows into `state`, reading from the last offset.
+    Returns the number of rows read."""
+    if not path.exists():
+        state.clear()
+        return 0
+    size = path.stat().st_size
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if (state.get('header') != header.decode('utf-8', 'replace') or size < state.get('offset', 0)
+                or state.get('gap_s') != gap_s):
+            state.clear()
+            state.update(header=header.decode('utf-8', 'replace'), offset=f.tell(), gap_s=gap_s,
+                         rows=0, by_label_eye={}, sessions={})
+        f.seek(state['offset'])
+        chunk = f.read()
+    end = chunk.rfind(b'\n') + 1  # leave a partially written last line for next time
+    if not end:
+        return 0
+    state['offset'] += end
+    fields = next(csv.reader([state['header']]))
+    n = 0
+    for row in csv.DictReader(io.StringIO(chunk[:end].decode('utf-8', 'replace')), fieldnames=fields):
+        label = row.get('label') or '?'
+        key = f"{label}/{row.get('eye') or '-'}"
+        state['by_label_eye'][key] = state['by_label_eye'].get(key, 0) + 1
+        per = state['sessions'].setdefault(session_of(row, state, gap_s * 1000), {})
+        per[label] = per.get(label, 0) + 1
+        n += 1
+    state['rows'] += n
+    return n
+
+
+def update_stats(root, analyze: bool = True, full: bool = False, meta: str = 'metadata.csv',
+                 session_gap: float = 300.0):
+    """Update the cache for a dataset root and persist it if anything changed;
+    returns (cache, files_read)."""
+    root = Path(root)
+    cache = load_cache(root)
+    dirs = cache['dirs']
+
+    def marks():
+        # a rescan, deletion, new/removed class or metadata reset moves one of these
+        return ({c: (e.get('mtime_ns'), len(e.get('files', ()))) for c, e in dirs.items()},
+                [cache['meta'].get(k) for k in ('header', 'offset', 'gap_s')])
+
+    before = marks()
+    present = sorted(p.name for p in root.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    for gone in set(dirs) - set(present):
+        del dirs[gone]
+    changed = sum(scan_dir(root / c, dirs.setdefault(c, {}), analyze, full) for c in present)
+    changed += update_meta(root / meta, cache['meta'], session_gap)
+    if changed or marks() != before:
+        save_cache(root, cache)
+    return cache, changed
+
+
+def class_counts(root):
+    """Files per class directory, without decoding anything new."""
+    cache, _ = update_stats(root, analyze=False)
+    return {c: len(e['files']) for c, e in cache['dirs'].items()}
+
+
+def balanced_weights(counts, class_names):
+    """Inverse-frequency weights n_total / (k * n_c) in class_names order
+    (the label indices image_dataset_from_directory assigns)."""
+    n = np.array([max(counts.get(c, 0), 1) for c in class_names], np.float64)
+    return (n.sum() / (len(n) * n)).tolist()
+
+
+def summarize(cache):
+    total = sum(len(e['files']) for e in cache['dirs'].values())
+    owners = {}
+    classes = {}
+    for c, e in sorted(cache['dirs'].items()):
+        vals = [v for v in e['files'].values() if v[HASH] is not None]
+        hashes = [v[HASH] for v in vals]
+        for h in set(hashes):
+            owners.setdefault(h, set()).add(c)
+        means = np.array([v[MEAN] for v in vals if v[MEAN] is not None], np.float64)
+        stds = np.array([v[STD] for v in vals if v[STD] is not None], np.float64)
+        classes[c] = {
+            'count': len(e['files']),
+            'share': len(e['files']) / total if total else 0.0,
+            'analyzed': len(vals),
+            'duplicate_ratio': 1 - len(set(hashes)) / len(hashes) if hashes else 0.0,
+            'brightness_mean': float(means.mean()) if len(means) else None,
+            'brightness_hist': np.histogram(means, BRIGHTNESS_BINS)[0].tolist(),
+            'contrast_mean': float(stds.mean()) if len(stds) else None,
+            'contrast_hist': np.histogram(stds, CONTRAST_BINS)[0].tolist(),
+        }
+    analyzed = sum(c['analyzed'] for c in classes.values())
+    unique = len(owners)
+    return {
+        'total': total,
+        'classes': classes,
+        'duplicate_ratio': 1 - unique / analyzed if analyzed else 0.0,
+        'cross_class_duplicates': sum(1 for o in owners.values() if len(o) > 1),
+        'metadata': {k: cache['meta'].get(k) for k in ('rows', 'by_label_eye', 'sessions')} if cache['meta'] else None,
+    }
+
+
+def print_report(root, s, max_sessions):
+    print(f"\n== {root}: {s['total']} files, duplicate ratio {s['duplicate_ratio']:.1%}, "
+          f"{s['cross_class_duplicates']} hashes in more than one class")
+    if not s['classes']:
+        return
+    print(f"{'class':<12} {'count':>8} {'share':>7} {'dups':>7} {'bright':>7} {'contr':>7}")
+    for c, v in s['classes'].items():
+        fmt = lambda x: f"{x:>7.1f}" if x is not None else f"{'-':>7}"  # noqa: E731
+        print(f"{c:<12} {v['count']:>8} {v['share']:>7.1%} {v['duplicate_ratio']:>7.1%} "
+              f"{fmt(v['brightness_mean'])} {fmt(v['contrast_mean'])}")
+    edges = lambda b: ' '.join(f"{int(x):>5}" for x in b[:-1])  # noqa: E731
+    print(f"\nbrightness hist (bin start) {edges(BRIGHTNESS_BINS)}")
+    for c, v in s['classes'].items():
+        print(f"  {c:<25} " + ' '.join(f"{x:>5}" for x in v['brightness_hist']))
+    print(f"contrast hist (bin start)   {edges(CONTRAST_BINS)}")
+    for c, v in s['classes'].items():
+        print(f"  {c:<25} " + ' '.join(f"{x:>5}" for x in v['contrast_hist']))
+
+    meta = s['metadata']
+    if not meta:
+        return
+    print(f"\nmetadata: {meta['rows']} rows")
+    for key, n in sorted(meta['by_label_eye'].items()):
+        print(f"  {key:<16} {n:>8}")
+    sessions = list(meta['sessions'].items())
+    print(f"sessions: {len(sessions)} (most recent {min(len(sessions), max_sessions)})")
+    for sid, per in sessions[-max_sessions:]:
+        print(f"  {sid:<18} " + '  '.join(f"{k}={n}" for k, n in sorted(per.items())))
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('roots', nargs='+', help='Dataset roots (one subdirectory per class)')
+    p.add_argument('--full', action='store_true', help='Re-stat every file, not only new ones')
+    p.add_argument('--counts_only', action='store_true', help='Skip hashing/decoding new files')
+    p.add_argument('--meta', type=str, default='metadata.csv', help='Metadata CSV filename (in each root)')
+    p.add_argument('--session_gap', type=float, default=300.0, help='Seconds between rows that start a new session')
+    p.add_argument('--sessions', type=int, default=20, help='Sessions to list per root')
+    p.add_argument('--json', type=str, default=None, help='Also write the summaries to this JSON file')
+    args = p.parse_args()
+
+    out = {}
+    for root in args.roots:
+        if not Path(root).is_dir():
+            print('Dataset dir not found:', root)
+            continue
+        t0 = time.perf_counter()
+        cache, changed = update_stats(root, analyze=not args.counts_only, full=args.full,
+                                      meta=args.meta, session_gap=args.session_gap)
+        print(f"{root}: {changed} new/changed entries in {time.perf_counter() - t0:.2f}s")
+        out[root] = summarize(cache)
+        print_report(root, out[root], args.sessions)
+    if args.json:
+        Path(args.json).write_text(json.dumps(out, indent=2), encoding='utf-8')
+        print('\nSummary written to', args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Export a trained `.keras` model to TF.js without retraining.
+
+Converts the native Keras file the trainers save under model_export/ and runs
+the same model.json InputLayer patch as scripts/patch_tfjs_model_json.py so
+the browser loader accepts it.
+
+Usage:
+  python export_models.py --keras model_export/eye_state_cnn.keras --tfjs_out model/eye_state_model
+  python export_models.py --keras model_export/mouth_classifier.keras --tfjs_out model/mouth_classifier_model
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from lazy_imports import lazy_import, optional_import
+
+keras = lazy_import('tensorflow', 'keras')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from patch_tfjs_model_json import patch_model_json  # noqa: E402
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--keras', type=str, required=True, help='Path to a .keras model saved by a trainer')
+    p.add_argument('--tfjs_out', type=str, required=True, help='Output directory for model.json + shards')
+    args = p.parse_args()
+
+    keras_path = Path(args.keras)
+    if not keras_path.exists():
+        print('Keras model not found:', keras_path)
+        sys.exit(1)
+    tfjs = optional_import('tensorflowjs')
+    if tfjs is None:
+        print("tensorflowjs is not installed; cannot export TF.js.\nInstall with: pip install tensorflowjs")
+        sys.exit(1)
+
+    model = keras.models.load_model(keras_path, compile=False)
+    tfjs_out = Path(args.tfjs_out)
+    tfjs_out.mkdir(parents=True, exist_ok=True)
+    tfjs.converters.save_keras_model(model, str(tfjs_out))
+    print(f"TF.js model exported to {tfjs_out}")
+    if not patch_model_json(tfjs_out / 'model.json'):
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Offline inference over a recorded video: per-frame EAR/MOR + CNN probabilities.
+
+Runs the same pipeline as app.js `onResults` (MediaPipe FaceMesh, target face
+closest to the centre, EAR/MOR from landmarks, eye CNN on both eye crops with
+the right eye flipped, mouth classifier on the mouth crop) and writes one
+trace row per frame. The trace feeds simulate_alarm.py and cascade.py.
+Frames without a face get face=0 and blank EAR/MOR/probability cells; like
+the no-face branch of onResults, they reset the closed timer and push
+nothing into the smoothing history.
+
+Usage:
+  python infer_offline.py --video session.mp4 --out traces/session.csv
+  python infer_offline.py --video session.mp4 --cascade model/cascade.json
+  python infer_offline.py --video session.mp4 --backend tflite --threads 4
+
+With --cascade, the eye CNN only runs when the EAR is inside the calibrated
+ambiguity band (likewise the mouth classifier and MOR). Skipped frames get a
+stand-in probability of 0/1 and eye_cnn/mouth_cnn = 0, which is the same rule
+app.js applies when model/cascade.json is present.
+
+With --backend tflite, the .tflite exports next to the .keras paths (see
+train_utils.export_tflite) run through tflite_backend.py instead of Keras;
+pass --eye_model/--mouth_model explicitly to pick e.g. the _int8 variant.
+
+Output columns:
+  frame,t,face,ear_l,ear_r,ear,p_l,p_r,p_closed,eye_cnn,mor,p_yawn,mouth_cnn
+"""
+import argparse
+import csv
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from cascade import eye_gate, load_cascade, mouth_gate
+from collect_eye_data import LEFT_EYE, RIGHT_EYE, cv2, crop_eye, landmarks_eye_box, mp
+from lazy_imports import lazy_import
+from tflite_backend import TFLiteClassifier
+
+tf = lazy_import('tensorflow')
+keras = lazy_import('tensorflow', 'keras')
+
+
+def dist2d(a, b):
+    return math.hypot(a.x - b.x, a.y - b.y)
+
+
+def ear_for_eye(lm, eye):
+    # mirrors earForEye in app.js
+    ux = (lm[eye["upper"][0]].x + lm[eye["upper"][1]].x) / 2.0
+    uy = (lm[eye["upper"][0]].y + lm[eye["upper"][1]].y) / 2.0
+    lx = (lm[eye["lower"][0]].x + lm[eye["lower"][1]].x) / 2.0
+    ly = (lm[eye["lower"][0]].y + lm[eye["lower"][1]].y) / 2.0
+    horiz = dist2d(lm[eye["left"]], lm[eye["right"]])
+    if horiz <= 1e-6:
+        return 0.0
+    return math.hypot(ux - lx, uy - ly) / horiz
+
+
+def mouth_open_ratio(lm):
+    # mirrors mouthOpenRatio in app.js
+    width = dist2d(lm[61], lm[291])
+    if width <= 1e-6:
+        return 0.0
+    return dist2d(lm[13], lm[14]) / width
+
+
+def crop_mouth(frame_bgr, lm, out_w, out_h):
+    # same box as the mouth classifier block in onResults
+    top, bottom, left, right = lm[13], lm[14], lm[61], lm[291]
+    cx = (left.x + right.x) / 2.0
+    cy = (top.y + bottom.y) / 2.0
+    w = abs(right.x - left.x) * 1.6
+    h = abs(bottom.y - top.y) * 2.2
+    h_img, w_img, _ = frame_bgr.shape
+    x = int(max(0, min(w_img - 1, (cx - w / 2) * w_img)))
+    y = int(max(0, min(h_img - 1, (cy - h / 2) * h_img)))
+    ww = int(max(4, min(w_img, w * w_img)))
+    hh = int(max(4, min(h_img, h * h_img)))
+    crop = frame_bgr[y : y + hh, x : x + ww]
+    if crop.size == 0:
+        return None
+    crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+    return cv2.resize(crop, (out_w, out_h), interpolation=cv2.INTER_LINEAR)
+
+
+def target_face(faces):
+    """Index of the face whose landmark bbox centre is closest to the frame centre."""
+    best, best_d = 0, float('inf')
+    for i, f in enumerate(faces):
+        xs = [p.x for p in f.landmark]
+        ys = [p.y for p in f.landmark]
+        d = ((min(xs) + max(xs)) / 2 - 0.5) ** 2 + ((min(ys) + max(ys)) / 2 - 0.5) ** 2
+        if d < best_d:
+            best, best_d = i, d
+    return best
+
+
+def load_classifier(path, backend='keras', num_threads=None):
+    """Return a callable mapping a float32 batch to an (N, K) probability array."""
+    if backend == 'tflite':
+        return TFLiteClassifier(Path(path).with_suffix('.tflite'), num_threads=num_threads)
+    model = keras.models.load_model(path, compile=False)
+
+    def run(batch):
+        return np.asarray(model(tf.convert_to_tensor(batch), training=False)).reshape(len(batch), -1)
+    return run
+
+
+def yawn_prob(probs):
+    # binary yawn model: single sigmoid or [no, yes]; 4-class: neutral/open/smile/yawn
+    if len(probs) == 1:
+        return float(probs[0])
+    if len(probs) == 2:
+        return float(probs[1])
+    return float(probs[3] if len(probs) > 3 else probs[-1])
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--video', type=str, required=True, help='Video file (or camera index)')
+    p.add_argument('--out', type=str, default='trace.csv')
+    p.add_argument('--eye_model', type=str, default='model_export/eye_state_cnn.keras')
+    p.add_argument('--mouth_model', type=str, default='model_export/mouth_classifier.keras')
+    p.add_argument('--no_mouth', action='store_true', help='Skip the mouth classifier')
+    p.add_argument('--cascade', type=str, default=None, help='Cascade config JSON (see cascade.py)')
+    p.add_argument('--backend', choices=['keras', 'tflite'], default='keras')
+    p.add_argument('--threads', type=int, default=None, help='TFLite/XNNPACK threads')
+    p.add_argument('--eye_w', type=int, default=48)
+    p.add_argument('--eye_h', type=int, default=24)
+    p.add_argument('--mouth_w', type=int, default=64)
+    p.add_argument('--mouth_h', type=int, default=64)
+    p.add_argument('--max_frames', type=int, default=0)
+    args = p.parse_args()
+
+    cascade_cfg = load_cascade(args.cascade)
+    if args.cascade and cascade_cfg is None:
+        print('Cascade config not found:', args.cascade)
+        return
+    ext = '.tflite' if args.backend == 'tflite' else '.keras'
+    eye_model = load_classifier(args.eye_model, args.backend, args.threads)
+    mouth_model = None
+    if not args.no_mouth and Path(args.mouth_model).with_suffix(ext).exists():
+        mouth_model = load_classifier(args.mouth_model, args.backend, args.threads)
+
+    src = int(args.video) if args.video.isdigit() else args.video
+    cap = cv2.VideoCapture(src)
+    if not cap.isOpened():
+        print('Failed to open', args.video)
+        return
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    n_frames = n_faces = eye_runs = mouth_runs = 0
+    t_start = time.perf_counter()
+    mp_face_mesh = mp.solutions.face_mesh  # type: ignore[attr-defined]
+    with mp_face_mesh.FaceMesh(
+        max_num_faces=4,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+    ) as face_mesh, open(out, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['frame', 't', 'face', 'ear_l', 'ear_r', 'ear', 'p_l', 'p_r', 'p_closed', 'eye_cnn',
+                    'mor', 'p_yawn', 'mouth_cnn'])
+        while True:
+            ok, frame = cap.read()
+            if not ok or (args.max_frames and n_frames >= args.max_frames):
+                break
+            n_frames += 1
+            t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or n_frames / fps
+            res = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if not res.multi_face_landmarks:
+                w.writerow([n_frames - 1, f"{t:.4f}", 0, '', '', '', '', '', '', 0, '', '', 0])
+                continue
+            n_faces += 1
+            lm = res.multi_face_landmarks[target_face(res.multi_face_landmarks)].landmark
+
+            ear_l, ear_r = ear_for_eye(lm, LEFT_EYE), ear_for_eye(lm, RIGHT_EYE)
+            ear = (ear_l + ear_r) / 2.0
+            p_l = p_r = eye_gate(ear, cascade_cfg)
+            eye_cnn = p_l is None
+            if eye_cnn:
+                crops = []
+                for eye, flip in ((LEFT_EYE, False), (RIGHT_EYE, True)):
+                    c = crop_eye(frame, *landmarks_eye_box(lm, eye), args.eye_w, args.eye_h)
+                    if c is None:
+                        c = np.zeros((args.eye_h, args.eye_w), np.uint8)
+                    crops.append(cv2.flip(c, 1) if flip else c)
+                batch = np.stack(crops)[..., None].astype(np.float32) / 255.0
+                probs = eye_model(batch)[:, 0]
+                p_l, p_r = float(probs[0]), float(probs[1])
+                eye_runs += 1
+
+            mor = mouth_open_ratio(lm)
+            p_yawn, mouth_cnn = '', 0
+            if mouth_model is not None:
+                p_yawn = mouth_gate(mor, cascade_cfg)
+                mouth_cnn = int(p_yawn is None)
+                if mouth_cnn:
+                    c = crop_mouth(frame, lm, args.mouth_w, args.mouth_h)
+                    p_yawn = 0.0 if c is None else yawn_prob(mouth_model(c[None].astype(np.float32) / 255.0)[0])
+                    mouth_runs += 1
+
+            w.writerow([n_frames - 1, f"{t:.4f}", 1, f"{ear_l:.5f}", f"{ear_r:.5f}", f"{ear:.5f}",
+                        f"{p_l:.5f}", f"{p_r:.5f}", f"{(p_l + p_r) / 2:.5f}", int(eye_cnn),
+                        f"{mor:.5f}", p_yawn if p_yawn == '' else f"{p_yawn:.5f}", mouth_cnn])
+    cap.release()
+
+    elapsed = time.perf_counter() - t_start
+    print(f"{n_frames} frames ({n_faces} with a face) in {elapsed:.1f}s ({n_frames / max(elapsed, 1e-9):.1f} fps)")
+    if n_faces:
+        print(f"Eye CNN ran on {eye_runs}/{n_faces} frames (skip {1 - eye_runs / n_faces:.1%})")
+        if mouth_model is not None:
+            print(f"Mouth CNN ran on {mouth_runs}/{n_faces} frames (skip {1 - mouth_runs / n_faces:.1%})")
+    print('Trace written to', out)
+
+
+if __name__ == '__main__':
+    main()
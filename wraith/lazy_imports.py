@@ -0,0 +1,65 @@
+"""
+Deferred imports for the heavy dependencies (TensorFlow, MediaPipe, OpenCV).
+
+Scripts bind module-level names to proxies that import on first attribute
+access, so `--help`, argument errors and pure-JSON subcommands of the
+`wraith` CLI never pay the multi-second TensorFlow import:
+
+  tf = lazy_import('tensorflow')
+  keras = lazy_import('tensorflow', 'keras')
+  cv2 = lazy_import('cv2', hint='OpenCV (cv2) is required. ...')
+
+Annotations that mention a lazy module (e.g. `-> keras.Model`) must be
+deferred with `from __future__ import annotations`.
+"""
+import importlib
+import types
+
+
+class _LazyModule(types.ModuleType):
+    def __init__(self, name: str, attr=None, hint=None):
+        super().__init__(name if attr is None else f"{name}.{attr}")
+        # stored in __dict__ directly so lookups never go through __getattr__
+        self.__dict__['_lazy_spec'] = (name, attr, hint)
+        self.__dict__['_lazy_mod'] = None
+
+    def _load(self):
+        mod = self.__dict__['_lazy_mod']
+        if mod is None:
+            name, attr, hint = self.__dict__['_lazy_spec']
+            try:
+                mod = importlib.import_module(name)
+            except ImportError as e:
+                if hint:
+                    raise SystemExit(f"{hint}\n{e}")
+                raise
+            if attr:
+                mod = getattr(mod, attr)
+            self.__dict__['_lazy_mod'] = mod
+        return mod
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_mod'] is not None else 'not loaded'
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str, attr=None, hint=None):
+    """Return a proxy for `name` (or `name.attr`) that imports on first use.
+
+    With `hint`, a failed import exits with that message instead of raising.
+    """
+    return _LazyModule(name, attr, hint)
+
+
+def optional_import(name: str):
+    """Import `name` now, or return None when it (or a dependency) is missing."""
+    try:
+        return importlib.import_module(name)
+    except Exception:
+        return None
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark `wraith` CLI startup: wall time of `<command> --help` per subcommand.
+
+Usage:
+  python scripts/bench_startup.py [--repeat 5] [--commands train-eye patch]
+
+Each command runs in a fresh interpreter so import costs are measured cold
+(modulo the OS file cache). For reference it also times eagerly importing
+TensorFlow, MediaPipe and OpenCV, which is what every script used to pay.
+The "heavy" column lists the heavy modules each command actually imported.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent.parent
+HEAVY = ('tensorflow', 'mediapipe', 'cv2')
+
+# runs the CLI in-process, then reports which heavy modules ended up imported
+PROBE = (
+    "import sys; sys.path.insert(0, {here!r}); import cli\n"
+    "try:\n    cli.main({argv!r})\nexcept SystemExit:\n    pass\n"
+    "print('HEAVY=' + ','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def run(code: str, repeat: int):
+    times, out = [], ''
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=HERE)
+        times.append(time.perf_counter() - t0)
+        out = res.stdout
+    heavy = next((l[6:] for l in out.splitlines() if l.startswith('HEAVY=')), '')
+    return statistics.median(times), heavy
+
+
+def main():
+    sys.path.insert(0, str(HERE))
+    from cli import COMMANDS
+
+    p = argparse.ArgumentParser()
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--commands', nargs='+', default=list(COMMANDS))
+    args = p.parse_args()
+
+    print(f"{'command':<24} {'median s':>9}  heavy imports")
+    for cmd in args.commands:
+        code = PROBE.format(here=str(HERE), argv=[cmd, '--help'], heavy=HEAVY)
+        secs, heavy = run(code, args.repeat)
+        print(f"{cmd + ' --help':<24} {secs:>9.3f}  {heavy or '-'}")
+
+    eager = "import importlib\nfor m in {heavy!r}:\n    try:\n        importlib.import_module(m)\n    except Exception:\n        pass"
+    secs, _ = run(eager.format(heavy=HEAVY), args.repeat)
+    print(f"{'eager tf+mp+cv2 import':<24} {secs:>9.3f}  (reference)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Rank an unlabeled crop pool by model uncertainty and write a labeling queue.
+
+Loads the current eye or mouth `.keras` export, scores every crop in the pool
+with batched inference, ranks by uncertainty (margin or entropy) and picks a
+diverse top-K using a cheap k-means over the model's penultimate-layer
+embeddings. Label the queued crops into data/eye/{open,closed} or
+data/mouth/{neutral,open,smile,yawn} and retrain.
+
+Usage:
+  python select_uncertain_crops.py --task eye --pool data/pool/eye --top_k 200
+  python select_uncertain_crops.py --task mouth --pool data/pool/mouth --score entropy
+
+Output:
+  - Labeling queue CSV (default: <pool>/label_queue.csv) with columns
+    rank,path,uncertainty,margin,entropy,pred,cluster
+
+Notes:
+  - Crops are preprocessed exactly like the trainers' build_dataset
+    (grayscale 24x48 for eyes, RGB 64x64 for mouths, scaled to [0,1]).
+  - --threads sets TensorFlow's intra-op pool; decoding runs on tf.data's
+    parallel map so the CPU stays busy while the model scores each batch.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from dataset_stats import IMAGE_EXTS
+from lazy_imports import lazy_import
+
+tf = lazy_import('tensorflow')
+keras = lazy_import('tensorflow', 'keras')
+
+
+TASKS = {
+    'eye': {'model': 'model_export/eye_state_cnn.keras', 'channels': 1, 'img_w': 48, 'img_h': 24,
+            'classes': ['closed', 'open']},
+    'mouth': {'model': 'model_export/mouth_classifier.keras', 'channels': 3, 'img_w': 64, 'img_h': 64,
+              'classes': ['neutral', 'open', 'smile', 'yawn']},
+}
+
+
+def list_pool(pool: Path):
+    # os.scandir avoids a stat() per entry, which matters on very large pools
+    paths = []
+    stack = [pool]
+    while stack:
+        d = stack.pop()
+        with os.scandir(d) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(Path(e.path))
+                elif e.name.lower().endswith(IMAGE_EXTS):
+                    paths.append(e.path)
+    paths.sort()
+    return paths
+
+
+def build_pool_dataset(paths, img_w: int, img_h: int, channels: int, batch: int):
+    def load(path):
+        raw = tf.io.read_file(path)
+        img = tf.io.decode_image(raw, channels=channels, expand_animations=False)
+        img = tf.image.resize(img, (img_h, img_w))  # bilinear, as image_dataset_from_directory
+        return tf.cast(img, tf.float32) / 255.0
+    autotune = tf.data.AUTOTUNE
+    ds = tf.data.Dataset.from_tensor_slices(paths)
+    return ds.map(load, num_parallel_calls=autotune, deterministic=True).batch(batch).prefetch(autotune)
+
+
+def scoring_model(model: keras.Model) -> keras.Model:
+    """Wrap `model` so one forward pass returns (embedding, probabilities).
+
+    The embedding is the output of the last Dense layer before the classifier
+    head (64-d for the eye CNN, 128-d for the mouth classifier).
+    """
+    dense = [l for l in model.layers if isinstance(l, keras.layers.Dense)]
+    if len(dense) < 2:
+        raise ValueError(f"Model {model.name} has no hidden Dense layer to embed with")
+    return keras.Model(model.inputs, [dense[-2].output, model.outputs[0]])
+
+
+def to_class_probs(probs: np.ndarray) -> np.ndarray:
+    # sigmoid head -> two-column [P(0), P(1)] so margin/entropy are uniform across tasks
+    if probs.ndim == 1 or probs.shape[1] == 1:
+        p = probs.reshape(-1)
+        return np.stack([1.0 - p, p], axis=1)
+    return probs
+
+
+def uncertainty_scores(probs: np.ndarray):
+    """Return (margin, entropy), both in [0,1] with 1 = most uncertain."""
+    probs = np.clip(probs, 1e-7, 1.0)
+    top2 = np.sort(probs, axis=1)[:, -2:]
+    margin = 1.0 - (top2[:, 1] - top2[:, 0])
+    entropy = -(probs * np.log(probs)).sum(axis=1) / np.log(probs.shape[1])
+    return margin, entropy
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 42):
+    """Plain Lloyd's k-means with k-means++ seeding; returns cluster ids."""
+    rng = np.random.default_rng(seed)
+    n = x.shape[0]
+    centers = [x[rng.integers(n)]]
+    d2 = ((x - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = d2.sum()
+        idx = rng.integers(n) if total <= 0 else rng.choice(n, p=d2 / total)
+        centers.append(x[idx])
+        d2 = np.minimum(d2, ((x - x[idx]) ** 2).sum(axis=1))
+    c = np.stack(centers)
+    assign = np.zeros(n, dtype=np.int64)
+    for it in range(iters):
+        # ||x-c||^2 = ||x||^2 - 2x.c + ||c||^2 ; ||x||^2 is constant per row
+        dist = -2.0 * x @ c.T + (c ** 2).sum(axis=1)[None, :]
+        new_assign = dist.argmin(axis=1)
+        if it > 0 and np.array_equal(new_assign, assign):
+            break
+        assign = new_assign
+        for j in range(k):
+            members = x[assign == j]
+            if len(members):
+                c[j] = members.mean(axis=0)
+    return assign
+
+
+def select_diverse(emb: np.ndarray, score: np.ndarray, top_k: int, candidate_factor: int = 4, seed: int = 42):
+    """Pick `top_k` indices: cluster the most uncertain candidates, then take
+    the most uncertain member of each cluster (round-robin until full)."""
+    n = len(score)
+    top_k = min(top_k, n)
+    n_cand = min(n, top_k * max(1, candidate_factor))
+    cand = np.argsort(-score, kind='stable')[:n_cand]
+    if top_k == n_cand:
+        return cand, np.zeros(len(cand), dtype=np.int64)
+    e = emb[cand]
+    e = e / (np.linalg.norm(e, axis=1, keepdims=True) + 1e-8)
+    assign = kmeans(e, top_k, seed=seed)
+    # candidates are already sorted by descending score, so the first hit per
+    # cluster is its most uncertain member
+    picked, clusters, taken = [], [], np.zeros(n_cand, dtype=bool)
+    while len(picked) < top_k:
+        seen = set()
+        for i, cl in enumerate(assign):
+            if taken[i] or cl in seen:
+                continue
+            seen.add(cl)
+            taken[i] = True
+            picked.append(cand[i])
+            clusters.append(cl)
+            if len(picked) == top_k:
+                break
+    return np.asarray(picked), np.asarray(clusters)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--task', choices=sorted(TASKS), default='eye')
+    p.add_argument('--pool', type=str, required=True, help='Directory of unlabeled crops (searched recursively)')
+    p.add_argument('--model', type=str, default=None, help='Path to .keras export (default depends on --task)')
+    p.add_argument('--out', type=str, default=None, help='Labeling queue CSV (default: <pool>/label_queue.csv)')
+    p.add_argument('--top_k', type=int, default=200)
+    p.add_argument('--score', choices=['margin', 'entropy'], default='margin')
+    p.add_argument('--candidate_factor', type=int, default=4, help='Cluster the top_k*N most uncertain crops')
+    p.add_argument('--batch', type=int, default=512)
+    p.add_argument('--threads', type=int, default=0, help='TF intra-op threads (0 = all cores)')
+    p.add_argument('--img_w', type=int, default=None)
+    p.add_argument('--img_h', type=int, default=None)
+    args = p.parse_args()
+
+    task = TASKS[args.task]
+    img_w = args.img_w or task['img_w']
+    img_h = args.img_h or task['img_h']
+    model_path = Path(args.model or task['model'])
+    pool = Path(args.pool)
+    out = Path(args.out) if args.out else pool / 'label_queue.csv'
+
+    if not pool.exists():
+        print('Pool dir not found:', pool)
+        sys.exit(1)
+    if not model_path.exists():
+        print(f"Model {model_path} not found. Train first (train_eye_cnn.py / train_mouth_classifier.py).")
+        sys.exit(1)
+
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads or (os.cpu_count() or 1))
+
+    paths = list_pool(pool)
+    if not paths:
+        print('No images found under', pool)
+        return
+    print(f"Scoring {len(paths)} crops from {pool} with {model_path}")
+
+    model = keras.models.load_model(model_path, compile=False)
+    scorer = scoring_model(model)
+    ds = build_pool_dataset(paths, img_w, img_h, task['channels'], args.batch)
+    emb, probs = scorer.predict(ds, verbose=1)
+    probs = to_class_probs(np.asarray(probs, dtype=np.float64))
+    emb = np.asarray(emb, dtype=np.float32)
+
+    margin, entropy = uncertainty_scores(probs)
+    score = margin if args.score == 'margin' else entropy
+    picked, clusters = select_diverse(emb, score, args.top_k, args.candidate_factor)
+
+    # class order follows image_dataset_from_directory (alphabetical folder names)
+    classes = task['classes']
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['rank', 'path', 'uncertainty', 'margin', 'entropy', 'pred', 'cluster'])
+        for rank, (i, cl) in enumerate(zip(picked, clusters), start=1):
+            k = int(probs[i].argmax())
+            pred = classes[k] if k < len(classes) else str(k)
+            w.writerow([rank, paths[i], f"{score[i]:.4f}", f"{margin[i]:.4f}", f"{entropy[i]:.4f}", pred, int(cl)])
+    print(f"Wrote {len(picked)} crops to {out} (mean {args.score} {score[picked].mean():.3f} vs pool {score.mean():.3f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+"""
+Replay per-frame traces through the app.js alarm state machine for parameter sweeps.
+
+Reimplements the drowsiness logic of `onResults` in app.js with NumPy and
+evaluates thousands of parameter combinations at once, so thresholds and
+smoothing can be tuned offline instead of in front of the webcam.
+
+Usage:
+  python simulate_alarm.py traces/*.csv --mode ear --ear_thresh 0.15:0.30:0.01 --duration 0.5:3.0:0.1
+  python simulate_alarm.py traces/*.csv --mode cnn --cnn_thresh 0.3:0.9:0.02 --smooth_win 1,3,5,8
+  python simulate_alarm.py traces/*.csv --target yawn --yawn_thresh 0.4:0.9:0.05 --mor_min 0.2:0.6:0.02
+
+Trace CSV columns (one row per processed frame):
+  t or t_ms        frame timestamp (seconds / milliseconds)
+  ear | ear_l,ear_r        Eye Aspect Ratio (averaged if per-eye)
+  p_closed | p_l,p_r       raw (unsmoothed) CNN closed probability
+  mor, p_yawn              mouth-opening ratio and raw yawn probability
+  label, yawn_label        optional ground truth (1 = eyes closed / yawning)
+  eye_cnn, mouth_cnn       optional, 0 where infer_offline.py's cascade skipped the CNN
+  face                     optional, 0 on frames without a face (values ignored)
+
+Blank cells load as NaN. A frame with a blank probability (or EAR) is not
+pushed into the smoothing history and counts as open, so it resets the
+closed timer, as the no-face branch of onResults does.
+
+State machine being mirrored:
+  - EAR mode: closed = ear < thresh (no smoothing).
+  - CNN mode: closed = mean(smoothProb L/R) >= cnn_thresh. smoothProb keeps the
+    last CNN_SMOOTH_WIN pushes; onResults pushes every frame twice (face loop
+    and target recompute), which --pushes reproduces.
+  - Closed timer restarts on the first closed frame and resets on any open
+    frame; the alarm (boo) fires on the rising edge of closed_for >= duration.
+  - Yawn: smoothMouthScalar over MOUTH_SMOOTH_WIN frames, gated by
+    p >= yawn_thresh and mor >= mor_min, held for min_dur, with cooldown.
+    The eyePop animation lock is not modelled.
+
+Metrics per combination (with ground truth): detection rate over labelled
+episodes, mean latency from episode onset to alarm, and false alarms per
+hour (alarms outside any episode + --grace seconds).
+"""
+import argparse
+import csv
+import itertools
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Defaults mirrored from app.js / index.html
+CNN_SMOOTH_WIN = 5
+MOUTH_SMOOTH_WIN = 6
+SMOOTH_PUSHES_PER_FRAME = 2
+
+
+def parse_values(spec: str):
+    """Parse 'a:b:step' (inclusive range) or 'a,b,c' into a float array."""
+    if ':' in spec:
+        a, b, step = (float(v) for v in spec.split(':'))
+        n = int(np.floor((b - a) / step + 1e-9)) + 1
+        return np.round(a + step * np.arange(n), 6)
+    return np.array([float(v) for v in spec.split(',') if v.strip()])
+
+
+def load_trace(path: Path):
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        return None
+    cols = rows[0].keys()
+
+    def col(name):
+        return np.array([float(r[name]) if r[name] not in ('', None) else np.nan for r in rows])
+
+    def avg(single, left, right):
+        if single in cols:
+            return col(single)
+        if left in cols and right in cols:
+            return (col(left) + col(right)) / 2.0
+        return None
+
+    no_face = col('face') < 0.5 if 'face' in cols else np.zeros(len(rows), dtype=bool)
+
+    def signal(x):
+        if x is not None:
+            x[no_face] = np.nan
+        return x
+
+    if 't' in cols:
+        t = col('t')
+    elif 't_ms' in cols:
+        t = col('t_ms') / 1000.0
+    else:
+        raise ValueError(f"{path}: trace needs a 't' or 't_ms' column")
+    return {
+        't': t,
+        'ear': signal(avg('ear', 'ear_l', 'ear_r')),
+        'p_closed': signal(avg('p_closed', 'p_l', 'p_r')),
+        'mor': signal(col('mor')) if 'mor' in cols else None,
+        'p_yawn': signal(col('p_yawn')) if 'p_yawn' in cols else None,
+        'label': col('label') > 0.5 if 'label' in cols else None,
+        'yawn_label': col('yawn_label') > 0.5 if 'yawn_label' in cols else None,
+        'eye_cnn': col('eye_cnn') > 0.5 if 'eye_cnn' in cols else None,
+        'face': ~no_face,
+    }
+
+
+def rolling_mean(x: np.ndarray, win: int, pushes: int = 1):
+    """Value returned by the app's push/shift/average history after each frame.
+
+    Every frame with a finite x appends `pushes` copies of it to a history
+    capped at `win` entries; the returned value is the mean after the last
+    push. NaN frames push nothing and return NaN.
+    """
+    valid = np.isfinite(x)
+    out = np.full(len(x), np.nan)
+    seq = np.repeat(x[valid], pushes)
+    cs = np.concatenate([[0.0], np.cumsum(seq)])
+    end = pushes * (np.arange(int(valid.sum())) + 1)
+    start = np.maximum(0, end - win)
+    out[valid] = (cs[end] - cs[start]) / (end - start)
+    return out
+
+
+def closed_alarms(t: np.ndarray, closed: np.ndarray, need: np.ndarray):
+    """Vectorized closed-duration accumulation.
+
+    closed: (P, T) per-frame closed decisions; need: (P,) seconds.
+    Returns (P, T) bool of alarm rising edges. Temporaries are one int32 and
+    one float64 (P, T) array plus a few bool ones; times stay float64 so the
+    duration test matches the app exactly on long traces.
+    """
+    n = closed.shape[1]
+    idx = np.arange(n, dtype=np.int32)
+    # index of the most recent open frame; the closed run started right after it
+    start = np.where(closed, np.int32(-1), idx[None, :])
+    np.maximum.accumulate(start, axis=1, out=start)
+    start += 1
+    np.minimum(start, n - 1, out=start)
+    started = t[start]
+    del start
+    np.subtract(t[None, :], started, out=started)
+    drowsy = started >= need[:, None]
+    del started
+    drowsy &= closed
+    rising = drowsy.copy()
+    rising[:, 1:] &= ~drowsy[:, :-1]
+    return rising
+
+
+def yawn_alarms(t: np.ndarray, p: np.ndarray, mor: np.ndarray, thr, mor_min, min_dur, cooldown):
+    """Yawn triggers for every combo without stepping over frames.
+
+    p, mor: (T,) smoothed yawn probability and mouth ratio; the remaining
+    parameters are (P,) arrays. Returns (combo, frame) index arrays of the
+    triggers, sorted by combo then frame.
+
+    The gate (p >= thr and mor >= mor_min) is a set of runs per distinct
+    (thr, mor_min). Within a run the hold starts at the run start, so a
+    frame can fire once t - t[run start] >= min_dur. After a trigger at f
+    the hold restarts at f + 1 and the next trigger also needs
+    t - t[f] > cooldown. Each round finds the next trigger of every combo
+    from a sparse table of its gate runs, so the cost is
+    O(P * runs + P * triggers), not O(P * T).
+    """
+    n, n_combo = len(t), len(thr)
+    t_ext = np.append(t, np.inf)
+    pairs, group = np.unique(np.stack([thr, mor_min], axis=1), axis=0, return_inverse=True)
+    group = group.ravel()
+    # gate runs per distinct (thr, mor_min), each list closed by a sentinel run at frame n
+    starts, ends = [], []
+    for th, mm in pairs:
+        d = np.diff(np.concatenate([[0], ((p >= th) & (mor >= mm)).astype(np.int8), [0]]))
+        starts.append(np.append(np.flatnonzero(d == 1), n))
+        ends.append(np.append(np.flatnonzero(d == -1) - 1, n))
+    n_runs = np.array([len(starts[g]) for g in group])
+    g_off = np.concatenate([[0], np.cumsum([len(x) for x in starts])])
+    c_off = np.concatenate([[0], np.cumsum(n_runs)])
+    combo_of = np.repeat(np.arange(n_combo), n_runs)
+    src = np.repeat(g_off[group], n_runs) + np.arange(c_off[-1]) - np.repeat(c_off[:-1], n_runs)
+    run_start = np.concatenate(starts)[src]
+    run_end = np.concatenate(ends)[src]
+
+    # first frame of each run that satisfies min_dur; sentinels "fire" at n (= never)
+    first = np.maximum(np.searchsorted(t, t_ext[run_start] + min_dur[combo_of], 'left'), run_start)
+    sentinel = run_start == n
+    first[sentinel] = n
+    usable = sentinel | (first <= run_end)
+    # flat index of the next usable run at or after each run (never crosses a sentinel)
+    idx = np.arange(len(first))
+    next_usable = np.minimum.accumulate(np.where(usable, idx, len(idx))[::-1])[::-1]
+    next_usable = np.append(next_usable, len(idx) - 1)
+    end_key = combo_of * (n + 2) + run_end  # sorted: per combo, run ends increase
+
+    run = next_usable[c_off[:-1]]
+    frame = first[run]
+    combos, frames = [], []
+    active = np.flatnonzero(frame < n)
+    while len(active):
+        f, r = frame[active], run[active]
+        combos.append(active)
+        frames.append(f)
+        after_cool = np.searchsorted(t, t[f] + cooldown[active], 'right')
+        # same run: the hold restarted at f + 1
+        g_same = np.maximum(np.maximum(after_cool, f + 1),
+                            np.searchsorted(t, t_ext[f + 1] + min_dur[active], 'left'))
+        same = g_same <= run_end[r]
+        # a later run: the first one ending at or after the cooldown, else the next usable one
+        r1 = np.maximum(np.searchsorted(end_key, active * (n + 2) + after_cool, 'left'), r + 1)
+        r_later = np.where(usable[r1], r1, next_usable[r1 + 1])
+        g_later = np.where(usable[r1], np.maximum(first[r1], after_cool), first[r_later])
+        run[active] = np.where(same, r, r_later)
+        frame[active] = np.where(same, g_same, np.minimum(g_later, n))
+        active = active[frame[active] < n]
+    if not combos:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    combos, frames = np.concatenate(combos), np.concatenate(frames)
+    order = np.lexsort((frames, combos))
+    return combos[order], frames[order]
+
+
+def rows_per_chunk(max_cells: int, n_frames: int):
+    """Eye sweep: combos per vectorized block so a (combos, frames) array stays under max_cells."""
+    return max(1, max_cells // max(n_frames, 1))
+
+
+def episodes(label: np.ndarray):
+    """(start, end) index pairs of contiguous True runs."""
+    d = np.diff(np.concatenate([[0], label.astype(np.int8), [0]]))
+    return list(zip(np.flatnonzero(d == 1), np.flatnonzero(d == -1) - 1))
+
+
+def score(t: np.ndarray, events, n_combo: int, label, grace: float):
+    """Accumulate per-combo detection/latency/false-alarm counts for one trace.
+
+    events: (combo, frame) index arrays of alarms, sorted by combo then frame
+    (np.nonzero of a (P, T) alarm grid, or yawn_alarms). t must be
+    non-decreasing.
+    """
+    combo, frame = events
+    n = len(t)
+    n_alarms = np.bincount(combo, minlength=n_combo).astype(float)
+    out = {
+        'alarms': n_alarms,
+        'episodes': 0,
+        'detected': np.zeros(n_combo),
+        'latency_sum': np.zeros(n_combo),
+        'false_alarms': n_alarms.copy(),
+        'duration': float(t[-1] - t[0]) if n > 1 else 0.0,
+    }
+    if label is None:
+        out['false_alarms'][:] = np.nan
+        return out
+    key = combo.astype(np.int64) * n + frame
+    base = np.arange(n_combo, dtype=np.int64) * n
+    covered = np.zeros(n, dtype=bool)
+    for s, e in episodes(label):
+        lo = np.searchsorted(t, t[s], 'left')
+        hi = np.searchsorted(t, t[e] + grace, 'right')
+        covered[lo:hi] = True
+        # first alarm of each combo at or after the episode start
+        pos = np.searchsorted(key, base + lo)
+        nxt = key[np.minimum(pos, len(key) - 1)] if len(key) else base
+        found = (pos < len(key)) & (nxt < base + hi)
+        first = np.where(found, nxt - base, s)
+        out['episodes'] += 1
+        out['detected'] += found
+        out['latency_sum'] += np.where(found, t[first] - t[s], 0.0)
+    out['false_alarms'] = np.bincount(combo[~covered[frame]], minlength=n_combo).astype(float)
+    return out
+
+
+def merge(acc, part):
+    if acc is None:
+        return part
+    for k in acc:
+        acc[k] = acc[k] + part[k]
+    return acc
+
+
+def simulate_eye(traces, args):
+    if args.mode == 'ear':
+        grid = list(itertools.product([0], parse_values(args.ear_thresh), parse_values(args.duration)))
+    else:
+        grid = list(itertools.product(parse_values(args.smooth_win).astype(int), parse_values(args.cnn_thresh),
+                                      parse_values(args.duration)))
+    grid = np.array(grid, dtype=float)
+    acc = None
+    for tr in traces:
+        label = tr['label']
+        t = tr['t']
+        chunk = rows_per_chunk(args.max_cells, len(t))
+        parts = []
+        # smoothing is shared by every combo with the same window; compute once per window
+        for win in np.unique(grid[:, 0]):
+            sel = np.flatnonzero(grid[:, 0] == win)
+            if args.mode == 'ear':
+                if tr['ear'] is None:
+                    raise ValueError('EAR mode needs an ear or ear_l/ear_r column')
+                signal = tr['ear']
+            else:
+                if tr['p_closed'] is None:
+                    raise ValueError('CNN mode needs a p_closed or p_l/p_r column')
+                signal = rolling_mean(tr['p_closed'], int(win), args.pushes)
+            for c0 in range(0, len(sel), chunk):
+                rows = sel[c0:c0 + chunk]
+                thr = grid[rows, 1][:, None]
+                closed = signal[None, :] < thr if args.mode == 'ear' else signal[None, :] >= thr
+                alarms = closed_alarms(t, closed, grid[rows, 2])
+                parts.append((rows, score(t, np.nonzero(alarms), len(rows), label, args.grace)))
+        acc = merge(acc, reassemble(parts, len(grid)))
+    if args.mode == 'ear':
+        return grid[:, 1:], ['ear_thresh', 'duration'], acc
+    return grid, ['smooth_win', 'cnn_thresh', 'duration'], acc
+
+
+def simulate_yawn(traces, args):
+    grid = np.array(list(itertools.product(
+        parse_values(args.mouth_win).astype(int), parse_values(args.yawn_thresh), parse_values(args.mor_min),
+        parse_values(args.yawn_min_dur), parse_values(args.yawn_cooldown),
+    )), dtype=float)
+    names = ['mouth_win', 'yawn_thresh', 'mor_min', 'min_dur', 'cooldown']
+    acc = None
+    for tr in traces:
+        if tr['p_yawn'] is None or tr['mor'] is None:
+            raise ValueError('Yawn target needs p_yawn and mor columns')
+        t = tr['t']
+        parts = []
+        for win in np.unique(grid[:, 0]):
+            rows = np.flatnonzero(grid[:, 0] == win)
+            smooth = rolling_mean(tr['p_yawn'], int(win))
+            events = yawn_alarms(t, smooth, tr['mor'], grid[rows, 1], grid[rows, 2], grid[rows, 3], grid[rows, 4])
+            parts.append((rows, score(t, events, len(rows), tr['yawn_label'], args.grace)))
+        acc = merge(acc, reassemble(parts, len(grid)))
+    return grid, names, acc
+
+
+def reassemble(parts, n_combo):
+    """Scatter per-chunk score dicts back into full-grid arrays."""
+    out = {
+        'alarms': np.zeros(n_combo), 'episodes': 0, 'detected': np.zeros(n_combo),
+        'latency_sum': np.zeros(n_combo), 'false_alarms': np.zeros(n_combo), 'duration': 0.0,
+    }
+    for rows, part in parts:
+        for k in ('alarms', 'detected', 'latency_sum', 'false_alarms'):
+            out[k][rows] = part[k]
+        out['episodes'] = part['episodes']
+        out['duration'] = part['duration']
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('traces', nargs='+', help='Trace CSV files')
+    p.add_argument('--target', choices=['eye', 'yawn'], default='eye')
+    p.add_argument('--mode', choices=['ear', 'cnn'], default='ear', help='Eye decision source')
+    p.add_argument('--ear_thresh', type=str, default='0.12:0.35:0.01')
+    p.add_argument('--cnn_thresh', type=str, default='0.30:0.90:0.01')
+    p.add_argument('--duration', type=str, default='0.5:3.0:0.1', help='Closed Duration (sec)')
+    p.add_argument('--smooth_win', type=str, default=str(CNN_SMOOTH_WIN), help='CNN_SMOOTH_WIN values')
+    p.add_argument('--pushes', type=int, default=SMOOTH_PUSHES_PER_FRAME, help='smoothProb calls per frame')
+    p.add_argument('--mouth_win', type=str, default=str(MOUTH_SMOOTH_WIN))
+    p.add_argument('--yawn_thresh', type=str, default='0.25:0.95:0.05')
+    p.add_argument('--mor_min', type=str, default='0.20:0.70:0.05')
+    p.add_argument('--yawn_min_dur', type=str, default='0.1:2.0:0.1')
+    p.add_argument('--yawn_cooldown', type=str, default='3.0')
+    p.add_argument('--grace', type=float, default=1.0, help='Seconds after an episode in which an alarm still counts')
+    p.add_argument('--max_cells', type=int, default=8_000_000,
+                   help='Eye sweep: combos x frames per vectorized block (~20 bytes each at peak)')
+    p.add_argument('--out', type=str, default='sweep_results.csv')
+    p.add_argument('--top', type=int, default=10)
+    args = p.parse_args()
+
+    traces = [tr for tr in (load_trace(Path(f)) for f in args.traces) if tr is not None]
+    if not traces:
+        print('No frames in', args.traces)
+        sys.exit(1)
+    n_frames = sum(len(tr['t']) for tr in traces)
+
+    t0 = time.perf_counter()
+    if args.target == 'eye':
+        grid, names, acc = simulate_eye(traces, args)
+    else:
+        grid, names, acc = simulate_yawn(traces, args)
+    elapsed = time.perf_counter() - t0
+    print(f"Simulated {len(grid)} combos x {n_frames} frames ({len(traces)} traces) in {elapsed:.2f}s")
+
+    hours = max(acc['duration'], 1e-9) / 3600.0
+    n_ep = acc['episodes']
+    detect_rate = acc['detected'] / n_ep if n_ep else np.full(len(grid), np.nan)
+    latency = np.divide(acc['latency_sum'], acc['detected'], out=np.full(len(grid), np.nan), where=acc['detected'] > 0)
+    fa_per_hour = acc['false_alarms'] / hours
+
+    # best first: catch the most episodes, then fewest false alarms, then fastest
+    order = np.lexsort((np.nan_to_num(latency, nan=np.inf), np.nan_to_num(fa_per_hour, nan=np.inf),
+                        -np.nan_to_num(detect_rate, nan=0.0)))
+    header = names + ['alarms', 'detect_rate', 'mean_latency_s', 'false_alarms_per_hour']
+    with open(args.out, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        for i in order:
+            w.writerow([f"{v:g}" for v in grid[i]] + [int(acc['alarms'][i]), f"{detect_rate[i]:.4f}",
+                                                       f"{latency[i]:.3f}", f"{fa_per_hour[i]:.3f}"])
+    print(f"{n_ep} labelled episodes, {acc['duration']:.0f}s of trace; results written to {args.out}")
+    print(' '.join(f"{h:>12}" for h in header))
+    for i in order[:args.top]:
+        vals = [f"{v:12g}" for v in grid[i]]
+        vals += [f"{int(acc['alarms'][i]):12d}", f"{detect_rate[i]:12.3f}", f"{latency[i]:12.3f}",
+                 f"{fa_per_hour[i]:12.2f}"]
+        print(' '.join(vals))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""dataset_stats.update_stats only rewrites the cache when something changed."""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset_stats import CACHE_NAME, update_stats  # noqa: E402
+
+
+def touch_dir(d, step):
+    st = d.stat()
+    os.utime(d, ns=(st.st_atime_ns, st.st_mtime_ns + step * 1_000_000_000))
+
+
+def test_update_stats_skips_unchanged_write(tmp_path):
+    for c, n in (('closed', 3), ('open', 5)):
+        (tmp_path / c).mkdir()
+        for i in range(n):
+            (tmp_path / c / f"{i}.png").write_bytes(b'x')
+    (tmp_path / 'open' / 'notes.txt').write_text('not an image')
+    (tmp_path / 'metadata.csv').write_text('label,eye,timestamp\nopen,L,1000\n')
+    cache_path = tmp_path / CACHE_NAME
+
+    cache, changed = update_stats(tmp_path, analyze=False)
+    assert changed == 9 and {c: len(e['files']) for c, e in cache['dirs'].items()} == {'closed': 3, 'open': 5}
+    written = cache_path.stat().st_mtime_ns
+    os.utime(cache_path, ns=(written, written - 1))
+
+    _, changed = update_stats(tmp_path, analyze=False)
+    assert changed == 0 and cache_path.stat().st_mtime_ns == written - 1
+
+    # a deletion reads no new file but must still be persisted
+    (tmp_path / 'open' / '0.png').unlink()
+    touch_dir(tmp_path / 'open', 1)
+    _, changed = update_stats(tmp_path, analyze=False)
+    assert changed == 0 and cache_path.stat().st_mtime_ns != written - 1
+    cache, _ = update_stats(tmp_path, analyze=False)
+    assert len(cache['dirs']['open']['files']) == 4
+
+    written = cache_path.stat().st_mtime_ns
+    os.utime(cache_path, ns=(written, written - 1))
+    (tmp_path / 'metadata.csv').unlink()
+    cache, _ = update_stats(tmp_path, analyze=False)
+    assert cache['meta'] == {} and cache_path.stat().st_mtime_ns != written - 1
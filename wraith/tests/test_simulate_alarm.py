@@ -0,0 +1,144 @@
+"""simulate_alarm's vectorized state machine vs a per-frame port of app.js onResults."""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from simulate_alarm import closed_alarms, episodes, rolling_mean, score, yawn_alarms  # noqa: E402
+
+
+def smooth_prob_loop(p, win, pushes):
+    """smoothProb: push, shift past CNN_SMOOTH_WIN, average; NaN frames push nothing."""
+    hist, out = [], []
+    for x in p:
+        if not np.isfinite(x):
+            out.append(np.nan)
+            continue
+        for _ in range(pushes):
+            hist.append(x)
+            if len(hist) > win:
+                hist.pop(0)
+        out.append(sum(hist) / len(hist))
+    return np.array(out)
+
+
+def alarm_loop(t, p, win, pushes, thresh, need):
+    """Closed timer + drowsy rising edge; a NaN frame is a no-face frame
+    (closedStartMs = 0, nothing pushed, drowsy left as is)."""
+    hist, closed_start_ms, drowsy, fired = [], 0, False, []
+    for now_s, x in zip(t, p):
+        now = now_s * 1000.0
+        if not np.isfinite(x):
+            closed_start_ms = 0
+            fired.append(False)
+            continue
+        for _ in range(pushes):
+            hist.append(x)
+            if len(hist) > win:
+                hist.pop(0)
+        if sum(hist) / len(hist) >= thresh:
+            if closed_start_ms == 0:
+                closed_start_ms = now
+        else:
+            closed_start_ms = 0
+        closed_for = (now - closed_start_ms) / 1000.0 if closed_start_ms else 0.0
+        was = drowsy
+        drowsy = closed_for >= need
+        fired.append(drowsy and not was)
+    return np.array(fired)
+
+
+def synthetic_trace(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    # jittered ~30 fps timestamps starting after 0 (0 is the app's "not closed" sentinel)
+    t = 1.0 + np.cumsum(rng.uniform(0.025, 0.042, n))
+    closed = np.zeros(n, dtype=bool)
+    for s in rng.integers(0, n - 120, 25):
+        closed[s:s + rng.integers(5, 120)] = True
+    p = np.clip(np.where(closed, 0.85, 0.1) + rng.normal(0, 0.15, n), 0, 1)
+    p[rng.choice(n, 40, replace=False)] = np.nan
+    p[1500:1530] = np.nan  # a lost face in the middle of the trace
+    return t, p
+
+
+def test_rolling_mean_matches_smooth_prob():
+    _, p = synthetic_trace()
+    for win, pushes in ((1, 1), (5, 2), (6, 1), (8, 2)):
+        np.testing.assert_allclose(rolling_mean(p, win, pushes), smooth_prob_loop(p, win, pushes),
+                                   rtol=0, atol=1e-9, equal_nan=True)
+
+
+def test_closed_alarms_matches_loop():
+    t, p = synthetic_trace()
+    thresh = np.array([0.4, 0.5, 0.6, 0.7, 0.6, 0.5])
+    need = np.array([0.5, 1.0, 1.5, 0.8, 2.5, 0.1])
+    for win, pushes in ((5, 2), (3, 1)):
+        closed = rolling_mean(p, win, pushes)[None, :] >= thresh[:, None]
+        fast = closed_alarms(t, closed, need)
+        for i in range(len(thresh)):
+            ref = alarm_loop(t, p, win, pushes, thresh[i], need[i])
+            assert ref.any()
+            np.testing.assert_array_equal(fast[i], ref)
+
+
+def yawn_loop(t, p, mor, thresh, mor_min, min_dur, cooldown):
+    """Yawn gate held for min_dur with a cooldown; the hold restarts after a trigger."""
+    hold, last, fired = None, -np.inf, []
+    for now, x, m in zip(t, p, mor):
+        if not (x >= thresh and m >= mor_min):
+            hold = None
+            fired.append(False)
+            continue
+        if hold is None:
+            hold = now
+        fire = now - hold >= min_dur and now - last > cooldown
+        if fire:
+            last, hold = now, None
+        fired.append(fire)
+    return np.array(fired)
+
+
+def test_yawn_alarms_matches_loop():
+    rng = np.random.default_rng(1)
+    n = 6000
+    t = 1.0 + np.cumsum(rng.uniform(0.025, 0.042, n))
+    yawn = np.zeros(n, dtype=bool)
+    for s in rng.integers(0, n - 400, 30):
+        yawn[s:s + rng.integers(10, 400)] = True
+    p = rolling_mean(np.clip(np.where(yawn, 0.8, 0.1) + rng.normal(0, 0.2, n), 0, 1), 6)
+    p[rng.choice(n, 30, replace=False)] = np.nan
+    mor = np.clip(np.where(yawn, 0.5, 0.15) + rng.normal(0, 0.1, n), 0, 1)
+    grid = np.array([(th, mm, md, cd) for th in (0.3, 0.5, 0.7) for mm in (0.2, 0.4)
+                     for md in (0.0, 0.3, 1.0) for cd in (0.5, 3.0)])
+    combo, frame = yawn_alarms(t, p, mor, *grid.T)
+    assert np.all(np.diff(combo.astype(np.int64) * n + frame) > 0)
+    for i, row in enumerate(grid):
+        np.testing.assert_array_equal(frame[combo == i], np.flatnonzero(yawn_loop(t, p, mor, *row)))
+    # exercise repeat triggers inside one long gate run, not just one per run
+    assert np.bincount(combo).max() > 30
+
+
+def test_score_matches_masked_grid():
+    rng = np.random.default_rng(2)
+    n, n_combo, grace = 4000, 7, 1.0
+    t = np.cumsum(rng.uniform(0.025, 0.042, n))
+    alarms = rng.random((n_combo, n)) < 0.003
+    label = np.zeros(n, dtype=bool)
+    for s in rng.integers(0, n - 100, 20):
+        label[s:s + rng.integers(5, 100)] = True
+    out = score(t, np.nonzero(alarms), n_combo, label, grace)
+    covered = np.zeros(n, dtype=bool)
+    for i in range(n_combo):
+        detected, latency = 0, 0.0
+        for s, e in episodes(label):
+            win = (t >= t[s]) & (t <= t[e] + grace)
+            covered |= win
+            hits = np.flatnonzero(alarms[i] & win)
+            if len(hits):
+                detected += 1
+                latency += t[hits[0]] - t[s]
+        assert out['detected'][i] == detected
+        assert np.isclose(out['latency_sum'][i], latency)
+        assert out['false_alarms'][i] == (alarms[i] & ~covered).sum()
@@ -0,0 +1,155 @@
+"""
+TFLite inference backend for the eye and mouth models (XNNPACK on CPU).
+
+Loads the .tflite files the trainers write with --tflite and exposes them as
+a callable mapping a float32 batch to an (N, K) probability array, the same
+contract as infer_offline.load_classifier. The interpreter comes from the
+lightest package available: ai-edge-litert, then tflite-runtime, then full
+TensorFlow (tf.lite). All three apply the XNNPACK delegate to supported ops
+by default; --threads sets its thread pool.
+
+Usage:
+  python tflite_backend.py --keras model_export/eye_state_cnn.keras \\
+      --tflite model_export/eye_state_cnn.tflite model_export/eye_state_cnn_int8.tflite \\
+      --data_dir data/eye --threads 4
+  python tflite_backend.py --keras model_export/mouth_classifier.keras \\
+      --tflite model_export/mouth_classifier_int8.tflite --data_dir data/mouth
+
+The benchmark feeds the same validation batches (from the trainers'
+build_dataset, or random crops without --data_dir) to Keras `predict` and to
+each TFLite model, and reports ms/batch, crops/s and agreement with Keras.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from lazy_imports import lazy_import, optional_import
+
+tf = lazy_import('tensorflow')
+keras = lazy_import('tensorflow', 'keras')
+
+
+def interpreter_class():
+    """The TFLite Interpreter class from the lightest installed package."""
+    for name in ('ai_edge_litert.interpreter', 'tflite_runtime.interpreter'):
+        mod = optional_import(name)
+        if mod is not None:
+            return mod.Interpreter
+    return tf.lite.Interpreter
+
+
+class TFLiteClassifier:
+    """Callable TFLite model: float32 batch (N, H, W, C) in [0, 1] -> (N, K) probabilities.
+
+    The interpreter is resized when the batch size changes. Models with int8
+    or uint8 input/output tensors are quantized/dequantized here, so float
+    and fully-quantized exports are interchangeable.
+    """
+
+    def __init__(self, path, num_threads=None):
+        self.path = Path(path)
+        self.interp = interpreter_class()(model_path=str(self.path), num_threads=num_threads)
+        self.interp.allocate_tensors()
+        self.inp = self.interp.get_input_details()[0]
+        self.out = self.interp.get_output_details()[0]
+        self.batch = int(self.inp['shape'][0])
+
+    @property
+    def input_shape(self):
+        return tuple(int(d) for d in self.inp['shape'][1:])
+
+    def _resize(self, n):
+        self.interp.resize_tensor_input(self.inp['index'], [n, *self.input_shape])
+        self.interp.allocate_tensors()
+        self.inp = self.interp.get_input_details()[0]
+        self.out = self.interp.get_output_details()[0]
+        self.batch = n
+
+    def __call__(self, batch):
+        x = np.asarray(batch, np.float32)
+        if len(x) != self.batch:
+            self._resize(len(x))
+        dtype = self.inp['dtype']
+        if dtype != np.float32:
+            scale, zero = self.inp['quantization']
+            info = np.iinfo(dtype)
+            x = np.clip(np.round(x / scale + zero), info.min, info.max).astype(dtype)
+        self.interp.set_tensor(self.inp['index'], x)
+        self.interp.invoke()
+        y = self.interp.get_tensor(self.out['index'])
+        if self.out['dtype'] != np.float32:
+            scale, zero = self.out['quantization']
+            y = (y.astype(np.float32) - zero) * scale
+        return y.reshape(len(x), -1)
+
+
+def benchmark_batches(data_dir, shape, batch, n_batches):
+    """Validation batches from the matching trainer's build_dataset, or random crops."""
+    h, w, c = shape
+    if data_dir is None:
+        rng = np.random.default_rng(0)
+        return [rng.random((batch, h, w, c), dtype=np.float32) for _ in range(n_batches)]
+    if c == 1:
+        from train_eye_cnn import build_dataset
+        _, ds_val = build_dataset(Path(data_dir), w, h, batch)
+    else:
+        from train_mouth_classifier import build_dataset
+        _, ds_val, _ = build_dataset(Path(data_dir), w, h, batch)
+    return [np.asarray(x, np.float32) for x, _ in ds_val.take(n_batches) if len(x) == batch]
+
+
+def time_calls(fn, batches, repeat):
+    fn(batches[0])  # warm-up (allocation, delegate setup, tracing)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for x in batches:
+            fn(x)
+    return (time.perf_counter() - t0) / (repeat * len(batches))
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--keras', type=str, required=True, help='Reference .keras model')
+    p.add_argument('--tflite', type=str, nargs='+', required=True, help='One or more .tflite exports of it')
+    p.add_argument('--data_dir', type=str, default=None, help='Dataset root; random crops if omitted')
+    p.add_argument('--batch', type=int, default=32)
+    p.add_argument('--batches', type=int, default=20)
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--threads', type=int, default=None, help='TFLite/XNNPACK threads (default: runtime choice)')
+    args = p.parse_args()
+
+    for path in (args.keras, *args.tflite):
+        if not Path(path).exists():
+            print('Model not found:', path)
+            return
+
+    model = keras.models.load_model(args.keras, compile=False)
+    shape = tuple(int(d) for d in model.input_shape[1:])
+    batches = benchmark_batches(args.data_dir, shape, args.batch, args.batches)
+    if not batches:
+        print('No full batches of size', args.batch, 'in', args.data_dir)
+        return
+    n = args.batch * len(batches)
+    print(f"Interpreter: {interpreter_class().__module__}; {len(batches)} batches of {args.batch} x {shape}")
+
+    ref = np.concatenate([model.predict(x, verbose=0).reshape(len(x), -1) for x in batches])
+    secs = time_calls(lambda x: model.predict(x, verbose=0), batches, args.repeat)
+    print(f"{'backend':<36} {'ms/batch':>9} {'crops/s':>9} {'max |dp|':>9} {'argmax agree':>13}")
+    print(f"{'keras predict':<36} {secs * 1e3:>9.2f} {args.batch / secs:>9.0f} {'-':>9} {'-':>13}")
+    for path in args.tflite:
+        clf = TFLiteClassifier(path, num_threads=args.threads)
+        out = np.concatenate([clf(x) for x in batches])
+        secs = time_calls(clf, batches, args.repeat)
+        diff = float(np.abs(out - ref).max())
+        if ref.shape[1] == 1:
+            agree = np.mean((out[:, 0] >= 0.5) == (ref[:, 0] >= 0.5))
+        else:
+            agree = np.mean(out.argmax(1) == ref.argmax(1))
+        print(f"{Path(path).name:<36} {secs * 1e3:>9.2f} {args.batch / secs:>9.0f} {diff:>9.4f} {agree:>13.2%}")
+    print(f"({n} crops per pass, {args.repeat} passes)")
+
+
+if __name__ == '__main__':
+    main()
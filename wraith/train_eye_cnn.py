@@ -7,17 +7,22 @@ builds a small CNN, trains it, evaluates it, and exports to TF.js.
 Output:
   - Saved model: ./model_export/saved_model
   - TF.js model: ./wraith/model/eye_state_model (model.json + shards)
+  - With --tflite: ./model_export/eye_state_cnn.tflite and eye_state_cnn_int8.tflite
 
 Usage (Linux/macOS):
   python3 -m venv .venv && source .venv/bin/activate
   pip install -r requirements.txt
   python train_eye_cnn.py --epochs 8 --img_w 48 --img_h 24
+  python train_eye_cnn.py --workers 4          # data-parallel over 4 local processes
+  python train_eye_cnn.py --epochs 2 --scaling_report 1,2,4
 
 Notes:
   - If CEW link changes, place your dataset under ./data/eyes with
     subfolders open/ and closed/ containing images of single eyes.
   - You can generate eye crops from face images using MediaPipe offline if needed.
 """
+from __future__ import annotations
+
 import argparse
 import os
 import sys
@@ -27,13 +32,12 @@ import zipfile
 import tempfile
 
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras  # type: ignore[reportUnknownVariableType]
 
-try:
-    import tensorflowjs as tfjs
-except Exception:
-    tfjs = None
+import train_utils
+from lazy_imports import lazy_import, optional_import
+
+tf = lazy_import('tensorflow')
+keras = lazy_import('tensorflow', 'keras')
 
 
 def download_cew_if_needed(dst_dir: Path):
@@ -44,13 +48,21 @@ def download_cew_if_needed(dst_dir: Path):
     print("Skipping auto-download.")
 
 
-def build_dataset(root: Path, img_w: int, img_h: int, batch: int = 64):
+def build_dataset(root: Path, img_w: int, img_h: int, batch: int = 64, shard=None, uint8: bool = False):
+    """shard=(num_workers, index): load only this worker's share of the files."""
     root = Path(root)
     open_dir = root / "open"
     closed_dir = root / "closed"
     if not open_dir.exists() or not closed_dir.exists():
         raise FileNotFoundError(f"Expected dataset at {root}/open and {root}/closed")
 
+    if shard:
+        ds_train, _ = train_utils.sharded_image_dataset(root, "training", (img_h, img_w), "grayscale", True, batch,
+                                                        *shard)
+        ds_val, _ = train_utils.sharded_image_dataset(root, "validation", (img_h, img_w), "grayscale", True, batch,
+                                                      *shard)
+        return _normalize(ds_train, ds_val, uint8)
+
     ds_train = tf.keras.utils.image_dataset_from_directory(  # type: ignore[attr-defined]
         str(root),
         labels="inferred",
@@ -73,8 +85,14 @@ def build_dataset(root: Path, img_w: int, img_h: int, batch: int = 64):
         subset="validation",
         seed=42,
     )
-    # Normalize to [0,1]
+    return _normalize(ds_train, ds_val, uint8)
+
+
+def _normalize(ds_train, ds_val, uint8: bool):
+    # Normalize to [0,1]; in --perf mode keep uint8 and let the model's Rescaling layer do it
     def norm(x, y):
+        if uint8:
+            return tf.cast(tf.round(x), tf.uint8), y
         x = tf.cast(x, tf.float32) / 255.0
         return x, y
     autotune = tf.data.AUTOTUNE
@@ -121,8 +139,18 @@ def main():
     p.add_argument('--data_dir', type=str, default='data/eye')
     p.add_argument('--export_dir', type=str, default='model_export')
     p.add_argument('--tfjs_out', type=str, default='wraith/model/eye_state_model')
+    train_utils.add_distributed_args(p)
+    train_utils.add_perf_args(p)
+    train_utils.add_tflite_args(p)
+    train_utils.add_class_weight_args(p)
     args = p.parse_args()
 
+    if train_utils.maybe_launch_workers(args, __file__):
+        return
+    if args.perf:
+        train_utils.configure_threads()
+    strategy, n_workers, is_chief = train_utils.make_strategy(args)
+
     data_dir = Path(args.data_dir)
     if not data_dir.exists():
         print(f"Dataset dir {data_dir} not found. Creating placeholder.")
@@ -130,17 +158,42 @@ def main():
         print("Please add images to data/eye/open and data/eye/closed and rerun.")
         sys.exit(1)
 
-    ds_train, ds_val = build_dataset(data_dir, args.img_w, args.img_h, args.batch)
-    model = build_model(args.img_w, args.img_h)
-    model.summary()
+    # multi-worker: each worker decodes only its own share of the files
+    shard = (n_workers, args.task_index or 0) if n_workers > 1 else None
+    ds_train, ds_val = build_dataset(data_dir, args.img_w, args.img_h, args.batch,
+                                     shard=shard, uint8=args.perf)
+    ds_plain = ds_train  # unweighted: step-time report and int8 TFLite calibration
+    if args.class_weights == 'auto':
+        # image_dataset_from_directory numbers classes alphabetically: closed=0, open=1
+        ds_train = train_utils.apply_class_weights(ds_train, data_dir, ['closed', 'open'], args.class_counts)
+    ds_train, train_steps = train_utils.distribute_dataset(strategy, ds_train, args.batch, n_workers)
+    ds_val, val_steps = train_utils.distribute_dataset(strategy, ds_val, args.batch, n_workers, shuffle=False)
+    with strategy.scope():
+        model = build_model(args.img_w, args.img_h)
+        train_model = model
+        if args.perf:
+            train_model = train_utils.perf_model(model, 'binary_crossentropy', args.steps_per_execution)
+    if is_chief:
+        model.summary()
+    if args.perf and n_workers == 1:
+        train_utils.report_step_times(lambda: build_model(args.img_w, args.img_h), 'binary_crossentropy', ds_plain,
+                                      args.steps_per_execution)
 
+    global_batch = args.batch * n_workers
+    throughput = train_utils.throughput_callback(global_batch)
     callbacks = [
         keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=4, restore_best_weights=True),
+        throughput,
     ]
-    model.fit(ds_train, validation_data=ds_val, epochs=args.epochs, callbacks=callbacks)
+    train_model.fit(ds_train, validation_data=ds_val, epochs=args.epochs, callbacks=callbacks,
+                    steps_per_epoch=train_steps, validation_steps=val_steps)
 
-    eval_res = model.evaluate(ds_val, verbose=0)
-    print({k: float(v) for k, v in zip(model.metrics_names, eval_res)})
+    eval_res = train_model.evaluate(ds_val, steps=val_steps, verbose=0)
+    print({k: float(v) for k, v in zip(train_model.metrics_names, eval_res)})
+    if is_chief:
+        train_utils.write_metrics(args.metrics_out, n_workers, global_batch, throughput)
+    if not is_chief or args.skip_export:
+        return
 
     export_dir = Path(args.export_dir)
     saved_dir = export_dir / 'saved_model'
@@ -150,6 +203,7 @@ def main():
         model.export(str(saved_dir))
         print(f"SavedModel exported to {saved_dir}")
     except Exception as e:
+        saved_dir = None
         print(f"SavedModel export failed ({e}); continuing to save native Keras file.")
 
     # Always save a native Keras .keras file (helps downstream TF.js conversion)
@@ -160,6 +214,10 @@ def main():
     except Exception as e:
         print(f"Failed to save Keras .keras file: {e}")
 
+    if args.tflite:
+        train_utils.export_tflite(model, saved_dir, export_dir, 'eye_state_cnn', ds_plain, args.tflite_samples)
+
+    tfjs = optional_import('tensorflowjs')
     if tfjs is None:
         print("tensorflowjs is not installed; skipping TF.js export.\nInstall with: pip install tensorflowjs")
         return
@@ -3,6 +3,7 @@ Train a small CNN for mouth classification (neutral/open/smile/yawn).
 
 Usage:
   python wraith/train_mouth_classifier.py --epochs 12 --img_w 64 --img_h 64
+  python wraith/train_mouth_classifier.py --workers 4   # data-parallel over 4 local processes
 
 Dataset layout:
   data/yawn/neutral/
@@ -10,20 +11,28 @@ Dataset layout:
   data/yawn/smile/
   data/yawn/yawn/
 
-Exports TF.js model to `wraith/model/mouth_classifier_model/`.
+Exports TF.js model to `wraith/model/mouth_classifier_model/`; with --tflite also
+`model_export/mouth_classifier.tflite` and `mouth_classifier_int8.tflite`.
 """
 import argparse
 from pathlib import Path
-import tensorflow as tf
-from tensorflow import keras  # type: ignore[reportUnknownVariableType]
 
-try:
-    import tensorflowjs as tfjs
-except Exception:
-    tfjs = None
+import train_utils
+from lazy_imports import lazy_import, optional_import
 
+tf = lazy_import('tensorflow')
+keras = lazy_import('tensorflow', 'keras')
+
+
+def build_dataset(root: Path, img_w: int, img_h: int, batch: int = 64, shard=None, uint8: bool = False):
+    """shard=(num_workers, index): load only this worker's share of the files."""
+    if shard:
+        ds_train_raw, class_names = train_utils.sharded_image_dataset(root, 'training', (img_h, img_w), 'rgb', False,
+                                                                      batch, *shard)
+        ds_val_raw, _ = train_utils.sharded_image_dataset(root, 'validation', (img_h, img_w), 'rgb', False,
+                                                          batch, *shard)
+        return (*_normalize(ds_train_raw, ds_val_raw, uint8), class_names)
 
-def build_dataset(root: Path, img_w: int, img_h: int, batch: int = 64):
     ds_train_raw = keras.utils.image_dataset_from_directory(  # type: ignore[attr-defined]
         str(root),
         labels='inferred',
@@ -46,14 +55,20 @@ def build_dataset(root: Path, img_w: int, img_h: int, batch: int = 64):
     )
     # capture class names before applying dataset transformations which strip attributes
     class_names = ds_train_raw.class_names  # type: ignore[attr-defined]
+    return (*_normalize(ds_train_raw, ds_val_raw, uint8), class_names)
 
+
+def _normalize(ds_train_raw, ds_val_raw, uint8: bool):
+    # in --perf mode keep uint8 and let the model's Rescaling layer normalize
     def norm(x,y):
+        if uint8:
+            return tf.cast(tf.round(x), tf.uint8), y
         x = tf.cast(x, tf.float32) / 255.0
         return x, y
     autotune = tf.data.AUTOTUNE
     ds_train = ds_train_raw.map(norm, num_parallel_calls=autotune).cache().shuffle(2048).prefetch(autotune)  # type: ignore[reportUnknownMemberType]
     ds_val = ds_val_raw.map(norm, num_parallel_calls=autotune).cache().prefetch(autotune)  # type: ignore[reportUnknownMemberType]
-    return ds_train, ds_val, class_names
+    return ds_train, ds_val
 
 
 def build_model(img_w: int, img_h: int, n_classes: int):
@@ -88,27 +103,62 @@ def main():
     p.add_argument('--batch', type=int, default=64)
     p.add_argument('--data_dir', type=str, default='data/mouth')
     p.add_argument('--tfjs_out', type=str, default='wraith/model/mouth_classifier_model')
+    train_utils.add_distributed_args(p)
+    train_utils.add_perf_args(p)
+    train_utils.add_tflite_args(p)
+    train_utils.add_class_weight_args(p)
     args = p.parse_args()
 
+    if train_utils.maybe_launch_workers(args, __file__):
+        return
+    if args.perf:
+        train_utils.configure_threads()
+    strategy, n_workers, is_chief = train_utils.make_strategy(args)
+
     data_dir = Path(args.data_dir)
     if not data_dir.exists():
         print('Expected dataset at', data_dir)
         return
 
-    ds_train, ds_val, class_names = build_dataset(data_dir, args.img_w, args.img_h, args.batch)
+    # multi-worker: each worker decodes only its own share of the files
+    shard = (n_workers, args.task_index or 0) if n_workers > 1 else None
+    ds_train, ds_val, class_names = build_dataset(data_dir, args.img_w, args.img_h, args.batch,
+                                                  shard=shard, uint8=args.perf)
     n_classes = len(class_names)
     print('Classes:', class_names)
-
-    model = build_model(args.img_w, args.img_h, n_classes)
-    model.summary()
-    model.fit(ds_train, validation_data=ds_val, epochs=args.epochs)
+    ds_plain = ds_train  # unweighted: step-time report and int8 TFLite calibration
+    if args.class_weights == 'auto':
+        ds_train = train_utils.apply_class_weights(ds_train, data_dir, class_names, args.class_counts)
+    ds_train, train_steps = train_utils.distribute_dataset(strategy, ds_train, args.batch, n_workers)
+    ds_val, val_steps = train_utils.distribute_dataset(strategy, ds_val, args.batch, n_workers, shuffle=False)
+
+    with strategy.scope():
+        model = build_model(args.img_w, args.img_h, n_classes)
+        train_model = model
+        if args.perf:
+            train_model = train_utils.perf_model(model, 'sparse_categorical_crossentropy', args.steps_per_execution)
+    if is_chief:
+        model.summary()
+    if args.perf and n_workers == 1:
+        train_utils.report_step_times(lambda: build_model(args.img_w, args.img_h, n_classes),
+                                      'sparse_categorical_crossentropy', ds_plain, args.steps_per_execution)
+    global_batch = args.batch * n_workers
+    throughput = train_utils.throughput_callback(global_batch)
+    train_model.fit(ds_train, validation_data=ds_val, epochs=args.epochs, callbacks=[throughput],
+                    steps_per_epoch=train_steps, validation_steps=val_steps)
+    if is_chief:
+        train_utils.write_metrics(args.metrics_out, n_workers, global_batch, throughput)
+    if not is_chief or args.skip_export:
+        return
 
     export_dir = Path('model_export') / 'mouth_classifier_saved'
     export_dir.parent.mkdir(parents=True, exist_ok=True)
+    saved_dir = export_dir
     try:
         model.export(str(export_dir))
         print('SavedModel exported to', export_dir)
     except Exception as e:
+        saved_dir = None
         print('SavedModel export failed:', e)
 
     # Always save a native Keras .keras file to support reliable TF.js conversion
@@ -119,6 +169,10 @@ def main():
     except Exception as e:
         print('Failed to save Keras .keras file:', e)
 
+    if args.tflite:
+        train_utils.export_tflite(model, saved_dir, export_dir.parent, 'mouth_classifier', ds_plain, args.tflite_samples)
+
+    tfjs = optional_import('tensorflowjs')
     if tfjs is None:
         print('tensorflowjs not installed; skipping TF.js export')
         return
@@ -0,0 +1,417 @@
+"""
+Shared training helpers for train_eye_cnn.py and train_mouth_classifier.py.
+
+Multi-worker data parallelism (tf.distribute.MultiWorkerMirroredStrategy):
+
+  # N local worker processes on this machine (ports picked automatically)
+  python train_eye_cnn.py --workers 4
+
+  # one worker per host over the LAN; run on every host with its own index
+  python train_eye_cnn.py --worker_hosts 10.0.0.5:23456,10.0.0.6:23456 --task_index 0
+
+  # samples/s for each worker count (short runs, nothing exported)
+  python train_eye_cnn.py --epochs 2 --scaling_report 1,2,4
+
+`--batch` stays the per-worker batch; the global batch is batch * workers.
+The file list is split between workers before anything is decoded, so each
+worker reads, decodes and caches only its own share of the images. Every
+worker keeps the same number of files, so all of them run the same number of
+steps per epoch and none waits for another at the end. Only the chief
+(task 0) exports models.
+
+CPU performance mode (--perf): thread pools sized from the core count, uint8
+input pipeline with a Rescaling layer in front of the model, XLA
+(jit_compile) and steps_per_execution. For 48x24 / 64x64 inputs per-step
+dispatch overhead dominates, so these matter more than the math. The
+exported model is the plain float [0,1] network the browser expects.
+
+TFLite export (--tflite): alongside the .keras file, a float32 model and an
+int8 model calibrated on training crops from build_dataset, both converted
+from the exported SavedModel. A failed conversion exits non-zero. Run them with
+tflite_backend.py (XNNPACK, no full TensorFlow needed with ai-edge-litert
+or tflite-runtime installed).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import dataset_stats
+from lazy_imports import lazy_import
+
+tf = lazy_import('tensorflow')
+keras = lazy_import('tensorflow', 'keras')
+
+
+LAUNCHER_FLAGS = ('--workers', '--scaling_report')
+
+
+def add_perf_args(p: argparse.ArgumentParser):
+    p.add_argument('--perf', action='store_true', help='XLA, tuned thread pools, uint8 input pipeline')
+    p.add_argument('--steps_per_execution', type=int, default=32, help='Training steps per dispatch with --perf')
+
+
+def configure_threads():
+    """Size TF's intra/inter-op pools from the core count (before any TF op runs).
+
+    Honors TF_NUM_INTRAOP_THREADS, which the local worker launcher sets to
+    split cores between processes.
+    """
+    cores = os.cpu_count() or 1
+    intra = int(os.environ.get('TF_NUM_INTRAOP_THREADS', cores))
+    inter = int(os.environ.get('TF_NUM_INTEROP_THREADS', min(2, cores)))
+    tf.config.threading.set_intra_op_parallelism_threads(intra)
+    tf.config.threading.set_inter_op_parallelism_threads(inter)
+    print(f"Thread pools: intra-op {intra}, inter-op {inter} ({cores} cores)")
+    return intra, inter
+
+
+def perf_model(core: keras.Model, loss: str, steps_per_execution: int, lr: float = 1e-3) -> keras.Model:
+    """Wrap `core` with a uint8 input + Rescaling(1/255) and compile it for speed.
+
+    The wrapper shares `core`'s layers, so training it trains `core`, which
+    keeps the float input the TF.js app feeds.
+    """
+    inputs = keras.Input(shape=core.input_shape[1:], dtype='uint8')
+    x = keras.layers.Rescaling(1.0 / 255)(inputs)
+    model = keras.Model(inputs, core(x), name=f"{core.name}_uint8")
+    model.compile(
+        optimizer=keras.optimizers.Adam(lr),
+        loss=loss,
+        metrics=['accuracy'],
+        jit_compile=True,
+        steps_per_execution=steps_per_execution,
+    )
+    return model
+
+
+def time_train_steps(model: keras.Model, ds, steps: int = 64) -> float:
+    """Mean seconds per training step, measured after one warm-up pass."""
+    steps = max(1, min(steps, int(ds.cardinality())))
+    sample = ds.take(steps).cache()
+    model.fit(sample, epochs=1, verbose=0)
+    t0 = time.perf_counter()
+    model.fit(sample, epochs=1, verbose=0)
+    return (time.perf_counter() - t0) / steps
+
+
+def report_step_times(build_fn, loss: str, ds_uint8, steps_per_execution: int):
+    """Print float-pipeline vs uint8+XLA+steps_per_execution step time on
+    throwaway models built by `build_fn`.
+
+    Both run in this process after configure_threads(), so the thread-pool
+    sizing is in neither number and the ratio leaves it out.
+    """
+    ds_float = ds_uint8.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y))
+    before = time_train_steps(build_fn(), ds_float)
+    after = time_train_steps(perf_model(build_fn(), loss, steps_per_execution), ds_uint8)
+    print(f"Step time (same thread pools): float pipeline {before * 1e3:.2f} ms -> "
+          f"uint8+XLA+steps_per_execution {after * 1e3:.2f} ms ({before / max(after, 1e-9):.2f}x)")
+
+
+def add_class_weight_args(p: argparse.ArgumentParser):
+    p.add_argument('--class_weights', choices=['none', 'auto'], default='none',
+                   help='auto: inverse class frequency from the dataset_stats counts')
+    # set by the --workers launcher so the workers don't all rescan the same root
+    p.add_argument('--class_counts', type=str, default=None, help=argparse.SUPPRESS)
+
+
+def apply_class_weights(ds, data_dir, class_names, class_counts=None):
+    """Append per-sample weights (inverse class frequency) to a batched (x, y)
+    dataset. Done on the dataset rather than via fit(class_weight=...) so it
+    also works once the dataset is distributed across workers.
+
+    class_counts: 'name=count,...' from the launcher; counted here if None.
+    """
+    if class_counts:
+        counts = {k: int(v) for k, v in (kv.split('=') for kv in class_counts.split(','))}
+    else:
+        counts = dataset_stats.class_counts(data_dir)
+    weights = dataset_stats.balanced_weights(counts, class_names)
+    print('Class weights:', ', '.join(f"{c}={w:.3f} (n={counts.get(c, 0)})" for c, w in zip(class_names, weights)))
+    table = tf.constant(weights, tf.float32)
+    return ds.map(lambda x, y: (x, y, tf.gather(table, tf.cast(tf.reshape(y, [-1]), tf.int32))),
+                  num_parallel_calls=tf.data.AUTOTUNE)
+
+
+def add_tflite_args(p: argparse.ArgumentParser):
+    p.add_argument('--tflite', action='store_true', help='Also export float32 and int8 TFLite models')
+    p.add_argument('--tflite_samples', type=int, default=200, help='Representative samples for int8 calibration')
+
+
+def export_tflite(model: keras.Model, saved_dir, out_dir, name: str, rep_ds, samples: int = 200):
+    """Write <name>.tflite (float32) and <name>_int8.tflite next to the .keras file.
+
+    Both are converted from the SavedModel the trainer exported to
+    `saved_dir`; pass None when that export failed and `model` is exported to
+    a temporary directory instead. The int8 model quantizes weights and
+    activations, calibrated on `samples` crops from `rep_ds` (a batched
+    build_dataset split, float or --perf uint8). Its input/output stay
+    float32 so callers feed the same [0,1] crops as the Keras and TF.js
+    models. Exits non-zero if either conversion fails.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    scale = rep_ds.element_spec[0].dtype == tf.uint8
+
+    def representative():
+        for x, _ in rep_ds.unbatch().take(samples):
+            x = tf.cast(x, tf.float32)
+            if scale:
+                x = x / 255.0
+            yield [x[None]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if saved_dir is None:
+            saved_dir = Path(tmp) / 'saved_model'
+            model.export(str(saved_dir))
+        failed = []
+        for suffix, quantize in (('', False), ('_int8', True)):
+            path = out_dir / f"{name}{suffix}.tflite"
+            try:
+                conv = tf.lite.TFLiteConverter.from_saved_model(str(saved_dir))
+                if quantize:
+                    conv.optimizations = [tf.lite.Optimize.DEFAULT]
+                    conv.representative_dataset = representative
+                    conv.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+                path.write_bytes(conv.convert())
+                print(f"TFLite model exported to {path} ({path.stat().st_size / 1024:.1f} KiB)")
+            except Exception as e:
+                print(f"TFLite export to {path} failed: {e}")
+                failed.append(path.name)
+    if failed:
+        raise SystemExit(f"TFLite export failed: {', '.join(failed)}")
+
+
+def add_distributed_args(p: argparse.ArgumentParser):
+    p.add_argument('--workers', type=int, default=1, help='Number of local worker processes to spawn')
+    p.add_argument('--worker_hosts', type=str, default=None, help='Comma-separated host:port of every worker')
+    p.add_argument('--task_index', type=int, default=None, help='Index of this process in --worker_hosts')
+    p.add_argument('--scaling_report', type=str, default=None, help='Worker counts to benchmark, e.g. 1,2,4')
+    p.add_argument('--metrics_out', type=str, default=None, help='Write throughput JSON here (chief only)')
+    p.add_argument('--skip_export', action='store_true', help=argparse.SUPPRESS)
+
+
+def _free_ports(n: int):
+    socks = [socket.socket() for _ in range(n)]
+    try:
+        for s in socks:
+            s.bind(('localhost', 0))
+        return [s.getsockname()[1] for s in socks]
+    finally:
+        for s in socks:
+            s.close()
+
+
+def _strip_flags(argv, names):
+    out, skip = [], False
+    for a in argv:
+        if skip:
+            skip = False
+            continue
+        if a in names:
+            skip = True
+            continue
+        if any(a.startswith(n + '=') for n in names):
+            continue
+        out.append(a)
+    return out
+
+
+def _run_local_workers(script: str, argv, n: int, extra=()):
+    hosts = ','.join(f"localhost:{port}" for port in _free_ports(n))
+    env = dict(os.environ)
+    # split the cores between workers instead of letting each grab all of them
+    threads = str(max(1, (os.cpu_count() or 1) // n))
+    env.setdefault('TF_NUM_INTRAOP_THREADS', threads)
+    env.setdefault('TF_NUM_INTEROP_THREADS', '2')
+    procs = [
+        subprocess.Popen([sys.executable, script, *argv, '--worker_hosts', hosts, '--task_index', str(i), *extra],
+                         env=env)
+        for i in range(n)
+    ]
+    return [p.wait() for p in procs]
+
+
+def maybe_launch_workers(args, script: str) -> bool:
+    """Spawn local workers for --workers N / --scaling_report.
+
+    Returns True when this process only acted as the launcher (the workers did
+    the training), False when the caller should train in-process.
+    """
+    if args.task_index is not None or (args.workers <= 1 and not args.scaling_report):
+        return False
+    argv = _strip_flags(sys.argv[1:], LAUNCHER_FLAGS)
+    if getattr(args, 'class_weights', 'none') == 'auto' and not args.class_counts:
+        # count once here and hand the result to every worker
+        counts = dataset_stats.class_counts(args.data_dir)
+        argv += ['--class_counts', ','.join(f"{c}={n}" for c, n in counts.items())]
+
+    if not args.scaling_report:
+        codes = _run_local_workers(script, argv, args.workers)
+        if any(codes):
+            raise SystemExit(f"Worker exit codes: {codes}")
+        return True
+
+    counts = [int(c) for c in args.scaling_report.split(',') if c.strip()]
+    argv = _strip_flags(argv, ('--metrics_out',))
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in counts:
+            out = Path(tmp) / f"w{n}.json"
+            print(f"=== scaling run: {n} worker(s) ===")
+            codes = _run_local_workers(script, argv, n, ('--metrics_out', str(out), '--skip_export'))
+            if any(codes) or not out.exists():
+                print(f"Run with {n} worker(s) failed: exit codes {codes}")
+                continue
+            rows.append(json.loads(out.read_text()))
+    if not rows:
+        raise SystemExit('Scaling report: no successful runs')
+    base = rows[0]['samples_per_sec'] / rows[0]['workers']
+    print('\nworkers  global_batch  samples/s  speedup  efficiency')
+    for r in rows:
+        speedup = r['samples_per_sec'] / (base or 1e-9)
+        print(f"{r['workers']:>7}  {r['global_batch']:>12}  {r['samples_per_sec']:>9.1f}  "
+              f"{speedup:>6.2f}x  {speedup / r['workers']:>9.0%}")
+    return True
+
+
+def make_strategy(args):
+    """Return (strategy, num_workers, is_chief) for this process.
+
+    Must run before any other TensorFlow op so the collective runtime can be
+    configured from TF_CONFIG.
+    """
+    if not args.worker_hosts:
+        return tf.distribute.get_strategy(), 1, True
+    hosts = [h.strip() for h in args.worker_hosts.split(',') if h.strip()]
+    index = args.task_index or 0
+    os.environ['TF_CONFIG'] = json.dumps({
+        'cluster': {'worker': hosts},
+        'task': {'type': 'worker', 'index': index},
+    })
+    comm = tf.distribute.experimental.CommunicationOptions(
+        implementation=tf.distribute.experimental.CommunicationImplementation.RING)
+    strategy = tf.distribute.MultiWorkerMirroredStrategy(communication_options=comm)
+    print(f"Worker {index}/{len(hosts)}: {strategy.num_replicas_in_sync} replicas in sync")
+    return strategy, len(hosts), index == 0
+
+
+def sharded_image_dataset(root, subset: str, image_size, color_mode: str, binary: bool, batch: int,
+                          num_workers: int, index: int, validation_split: float = 0.2, seed: int = 42):
+    """This worker's share of an image_dataset_from_directory-style split.
+
+    Every worker lists the class folders the same way, sorted and then
+    shuffled with a fixed seed. The split into training/validation happens
+    before any file is read. Worker `index` keeps every num_workers-th file of
+    its subset, trimmed so all workers have the same count, and decodes only
+    those. Returns (batched dataset of (float32 image, label), class_names);
+    labels are float32 (N, 1) when `binary`, else int32 (N,).
+    """
+    root = Path(root)
+    class_names = sorted(d.name for d in root.iterdir() if d.is_dir())
+    paths, labels = [], []
+    for i, c in enumerate(class_names):
+        names = sorted(e.name for e in os.scandir(root / c)
+                       if e.is_file() and e.name.lower().endswith(dataset_stats.IMAGE_EXTS))
+        paths += [str(root / c / n) for n in names]
+        labels += [i] * len(names)
+    order = np.random.RandomState(seed).permutation(len(paths))
+    n_val = int(validation_split * len(paths))
+    order = order[len(order) - n_val:] if subset == 'validation' else order[:len(order) - n_val]
+    per_worker = len(order) // num_workers
+    if per_worker == 0:
+        raise ValueError(f"{root}: {len(order)} {subset} images is fewer than {num_workers} workers")
+    order = order[index::num_workers][:per_worker]
+    paths = np.array(paths)[order]
+    labels = np.array(labels)[order]
+    labels = labels.astype(np.float32)[:, None] if binary else labels.astype(np.int32)
+    channels = 1 if color_mode == 'grayscale' else 3
+
+    def load(path, label):
+        img = tf.io.decode_image(tf.io.read_file(path), channels=channels, expand_animations=False)
+        return tf.image.resize(img, image_size), label
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    return ds.map(load, num_parallel_calls=tf.data.AUTOTUNE).batch(batch), class_names
+
+
+def distribute_dataset(strategy, ds, batch: int, num_workers: int, shuffle: bool = True, seed: int = 42):
+    """Re-batch a worker's own data for the strategy.
+
+    `ds` is the batched (per-worker `batch`) output of build_dataset with
+    shard=(num_workers, index), i.e. already this worker's share of the files
+    (sharded_image_dataset). All workers hold the same number of files, so
+    the step count is the same everywhere. Returns
+    (distributed_dataset, steps_per_epoch); the dataset repeats, so pass the
+    step count to fit().
+    """
+    if num_workers <= 1:
+        return ds, None
+    global_batch = batch * num_workers
+    steps = max(1, int(ds.cardinality()))
+    flat = ds.unbatch()
+
+    def dataset_fn(ctx: tf.distribute.InputContext):
+        per_replica = ctx.get_per_replica_batch_size(global_batch)
+        d = flat
+        if shuffle:
+            d = d.shuffle(2048, seed=seed + ctx.input_pipeline_id)
+        return d.repeat().batch(per_replica, drop_remainder=True).prefetch(tf.data.AUTOTUNE)
+
+    return strategy.distribute_datasets_from_function(dataset_fn), steps
+
+
+def throughput_callback(global_batch: int):
+    """Keras callback for training samples/s, ignoring the first epoch (graph
+    tracing and cache fill). The class is built here so importing this module
+    does not import Keras."""
+
+    class ThroughputCallback(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.epoch_stats = []
+            self._t0 = 0.0
+            self._t_last = 0.0
+            self._batches = 0
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self._t0 = self._t_last = time.perf_counter()
+            self._batches = 0
+
+        def on_train_batch_end(self, batch, logs=None):
+            self._batches = batch + 1
+            self._t_last = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            # time to the last training batch, so validation is not counted
+            self.epoch_stats.append((self._batches * global_batch, self._t_last - self._t0))
+
+        @property
+        def samples_per_sec(self) -> float:
+            stats = self.epoch_stats[1:] or self.epoch_stats
+            samples = sum(n for n, _ in stats)
+            secs = sum(t for _, t in stats)
+            return samples / secs if secs > 0 else 0.0
+
+    return ThroughputCallback()
+
+
+def write_metrics(path, num_workers: int, global_batch: int, throughput):
+    metrics = {
+        'workers': num_workers,
+        'global_batch': global_batch,
+        'samples_per_sec': throughput.samples_per_sec,
+    }
+    print(f"Throughput: {metrics['samples_per_sec']:.1f} samples/s ({num_workers} worker(s), global batch {global_batch})")
+    if path:
+        Path(path).write_text(json.dumps(metrics))